@@ -6,6 +6,8 @@ from baseblock import BaseBlock
 
 
 class ApplicationExtensionBlock(BaseBlock):
+    __slots__ = ('identifer', 'auth_code', 'app_data')
+
     def __init__(self, seek_index: int, stream: io.BufferedReader):
         super().__init__(seek_index)
         self.identifer = None
@@ -13,6 +15,7 @@ class ApplicationExtensionBlock(BaseBlock):
         self.app_data = None
 
         self._process_data_stream(stream)
+        self._report_parsed()
 
     def _process_data_stream(self, stream: io.BufferedReader):
         stream.seek(self.seek_index)
@@ -50,13 +53,13 @@ class ApplicationExtensionBlock(BaseBlock):
         bs = self._read(stream, 8)
         if len(bs) != 8:
             return
-        self.identifer = bs
+        self.identifer = bytes(bs)
 
         # 5. Expect Application Authentication Code (3 bytes)
         bs = self._read(stream, 3)
         if len(bs) != 3:
             return
-        self.auth_code = bs
+        self.auth_code = bytes(bs)
 
         # 6. Expect Application Data
         self.app_data, sb_broken = self.load_data_sub_blocks(stream)
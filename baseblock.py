@@ -1,13 +1,36 @@
 import io
+import time
+
+import instrumentation
 
 
 class BaseBlock:
+    # A GIF can hold thousands of blocks, slots keep every block object small (no per-instance `__dict__`). Subclasses declare their own fields.
+    __slots__ = ('seek_index', 'broken', 'broken_reason', 'block_size', 'sub_block_count', 'parse_start')
+
     def __init__(self, seek_index: int):
-        print(f'Starting to parse {self.__class__.__name__} at {seek_index}.')
         self.seek_index = seek_index
         self.broken = True
         self.broken_reason = 'The stream has not been processed!'
         self.block_size = 0
+        self.sub_block_count = 0
+        # the clock is only read when an instrumentation hook is listening
+        self.parse_start = time.perf_counter() if instrumentation.hook.enabled else 0.0
+
+    def _report_parsed(self):
+        """Send the parsing event of this block to the instrumentation hook. Subclasses call it at the end of `__init__`."""
+        hook = instrumentation.hook
+        if hook.enabled:
+            hook.event(
+                self.__class__.__name__,
+                'block',
+                self.parse_start,
+                time.perf_counter(),
+                seek_index=self.seek_index,
+                block_size=self.block_size,
+                sub_blocks=self.sub_block_count,
+                broken=self.broken,
+            )
 
     def _read(self, stream: io.BufferedReader, length=1):
         bs = stream.read(length)
@@ -29,9 +52,56 @@ class BaseBlock:
                 break
 
             # 2. Expect Sub Block data
+            self.sub_block_count += 1
             block = self._read(stream, block_size)
             sub_blocks.append(block)
             if len(block) != block_size:
                 break
 
         return sub_blocks, broken
+
+    def gather_data_sub_blocks(self, stream: io.BufferedReader):
+        """Load the data sub-blocks into one contiguous buffer.
+
+        Every sub-block is appended to the buffer as soon as it is read, so there is no list of intermediate chunks to join. With a `MappedStream` the chunks are views of the mapped file and the payloads are copied exactly once.
+
+        Returns:
+            A tuple of the data (`bytearray`) and whether the data is broken.
+        """
+        data = bytearray()
+
+        while True:
+            # 1. Expect Sub Block size
+            bs = self._read(stream)
+            if len(bs) != 1:
+                return data, True
+            block_size = bs[0]
+            if block_size == 0:
+                return data, False
+
+            # 2. Expect Sub Block data
+            self.sub_block_count += 1
+            block = self._read(stream, block_size)
+            data += block
+            if len(block) != block_size:
+                return data, True
+
+    def skip_data_sub_blocks(self, stream: io.BufferedReader):
+        """Walk through the data sub-blocks by their size bytes without reading their data.
+
+        Returns:
+            Whether the data is broken.
+        """
+        while True:
+            # 1. Expect Sub Block size
+            bs = self._read(stream)
+            if len(bs) != 1:
+                return True
+            block_size = bs[0]
+            if block_size == 0:
+                return False
+
+            # 2. Skip Sub Block data
+            self.sub_block_count += 1
+            stream.seek(block_size, io.SEEK_CUR)
+            self.block_size += block_size
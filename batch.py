@@ -0,0 +1,83 @@
+import os
+import sys
+import glob
+import json
+import time
+import multiprocessing
+
+from decoder import GIF
+
+
+def expand_paths(patterns: list):
+    """Expand files, directories (searched recursively for `.gif` files) and glob patterns into a sorted list of files without duplicates."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, filenames in os.walk(pattern):
+                paths.extend(os.path.join(root, filename) for filename in filenames if filename.lower().endswith('.gif'))
+        elif glob.has_magic(pattern):
+            paths.extend(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+        else:
+            paths.append(pattern)
+
+    return sorted(set(paths))
+
+
+def decode_file(path: str):
+    """Decode every frame of a GIF file and summarize the result as a JSON serializable `dict`."""
+    result = {
+        'path': path,
+        'status': 'error',
+        'broken_reason': None,
+        'frames': 0,
+        'decode_time': 0.0,
+    }
+
+    if not os.path.isfile(path):
+        result['broken_reason'] = f'{path} is not a file!'
+        return result
+
+    start = time.perf_counter()
+    try:
+        with open(path, mode='rb') as stream:
+            gif = GIF(stream)
+    except Exception as ex:
+        result['broken_reason'] = f'{type(ex).__name__}: {ex}'
+        return result
+    finally:
+        result['decode_time'] = time.perf_counter() - start
+
+    result['frames'] = len(gif.images)
+    result['status'] = 'broken' if gif.broken else 'ok'
+    result['broken_reason'] = gif.broken_reason
+    return result
+
+
+def run(patterns: list, jobs=1, out=sys.stdout):
+    """Decode all files matching `patterns` on `jobs` processes and write one JSON line per file as soon as it is done.
+
+    Returns:
+        The number of files which are not decoded successfully.
+    """
+    paths = expand_paths(patterns)
+    failures = 0
+
+    def write(result: dict):
+        nonlocal failures
+        if result['status'] != 'ok':
+            failures += 1
+        out.write(json.dumps(result) + '\n')
+        out.flush()
+
+    if jobs <= 1:
+        for path in paths:
+            write(decode_file(path))
+        return failures
+
+    # small chunks keep the workers busy when file sizes vary a lot
+    chunksize = max(1, min(16, len(paths) // (jobs * 8)))
+    with multiprocessing.Pool(jobs) as pool:
+        for result in pool.imap_unordered(decode_file, paths, chunksize):
+            write(result)
+
+    return failures
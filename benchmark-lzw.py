@@ -0,0 +1,207 @@
+import os
+import sys
+import time
+import argparse
+
+import lzw
+from decoder import GIF
+from imageblock import ImageDescriptorBlock
+
+
+class ByteBitReader:
+    """The previous bit reader which takes the data one byte at a time (its "Ran out of data!" print is left out)."""
+
+    def __init__(self, data: bytes, num_bits: int):
+        self.data = data
+        self.index = 0
+        self.init_num_bits = num_bits
+        self.num_bits = self.init_num_bits
+        self.ended = False
+
+        self.buffer = self.data[self.index]
+        self.remain_bits_from_current_byte = 8
+        self.index += 1
+
+    def _next(self):
+        if self.index < len(self.data):
+            self.buffer = self.data[self.index]
+            self.index += 1
+            self.remain_bits_from_current_byte = 8
+        else:
+            self.ended = True
+            self.buffer = 0
+
+    def reset(self):
+        self.num_bits = self.init_num_bits
+
+    def read(self):
+        value = 0
+        remain_bits_for_this_value = self.num_bits
+
+        while remain_bits_for_this_value != 0:
+            if self.remain_bits_from_current_byte == 0:
+                self._next()
+
+            if remain_bits_for_this_value >= self.remain_bits_from_current_byte:
+                value += (self.buffer << (self.num_bits - remain_bits_for_this_value))
+                remain_bits_for_this_value -= self.remain_bits_from_current_byte
+                self.remain_bits_from_current_byte = 0
+            else:
+                temp_value = self.buffer << (8 - remain_bits_for_this_value)
+                temp_value = temp_value & 0xff
+                temp_value = temp_value >> (8 - remain_bits_for_this_value)
+                temp_value = temp_value << (self.num_bits - remain_bits_for_this_value)
+                value += temp_value
+
+                # subtract taken value from buffer
+                self.buffer = self.buffer >> remain_bits_for_this_value
+                self.remain_bits_from_current_byte -= remain_bits_for_this_value
+
+                remain_bits_for_this_value = 0
+
+        return value
+
+
+def decode_list_table(compressed_data: bytes, lzw_min_code_size: int):
+    """The previous decoder which keeps every code in the code table as a list of indices, with its bit reader."""
+    bit_reader = ByteBitReader(compressed_data, lzw_min_code_size + 1)
+
+    clear_code = 2 ** lzw_min_code_size
+    eoi_code = clear_code + 1
+
+    # the first code should be clear code
+    code = bit_reader.read()
+
+    index_stream = []
+
+    code_table = [[x] for x in range(clear_code)]
+    code_table.append([clear_code])
+    code_table.append([eoi_code])
+
+    code_table_limit = (1 << bit_reader.num_bits) - 1
+
+    code = bit_reader.read()
+    index_stream.extend(code_table[code])
+
+    while True:
+        previous_code = code
+        code = bit_reader.read()
+
+        if code == eoi_code:
+            break
+        if code == clear_code:
+            code_table = code_table[:eoi_code + 1]
+            bit_reader.reset()
+            code_table_limit = (1 << bit_reader.num_bits) - 1
+            code = bit_reader.read()
+            index_stream.append(code)
+            continue
+
+        if code < len(code_table):
+            index_stream.extend(code_table[code])
+            k = code_table[code][0]
+            indices = [*code_table[previous_code], k]
+            code_table.append(indices)
+        else:
+            k = code_table[previous_code][0]
+            indices = [*code_table[previous_code], k]
+            index_stream.extend(indices)
+            code_table.append(indices)
+
+        if (len(code_table) > code_table_limit) and (bit_reader.num_bits < 12):
+            bit_reader.num_bits += 1
+            code_table_limit = (1 << bit_reader.num_bits) - 1
+
+        if bit_reader.ended:
+            break
+
+    return index_stream
+
+
+def measure(func, repeat: int):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare the LZW decoder throughput with the previous list based implementation',
+    )
+
+    parser.add_argument(
+        'in_files',
+        type=str,
+        nargs='+',
+        help='the paths of GIF files',
+    )
+
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='the number of runs, the best one is reported',
+    )
+
+    args = parser.parse_args()
+
+    total_pixels = 0
+    total_old = 0.0
+    total_new = 0.0
+
+    for in_file in args.in_files:
+        if not os.path.isfile(in_file):
+            print(f'{in_file} is not a file!')
+            return 1
+
+        with open(in_file, mode='rb') as stream:
+            # decoded images do not keep their compressed data, so only index the images and load it
+            gif = GIF(stream, lazy=True)
+
+        file_pixels = 0
+        file_old = 0.0
+        file_new = 0.0
+
+        images = [block for block in gif.blocks if isinstance(block, ImageDescriptorBlock)]
+        for image in images:
+            if not image.load_compressed_data(gif.stream):
+                print(f'{in_file}: {image.broken_reason}')
+                return 1
+
+            pixel_count = image.width * image.height
+
+            expected = decode_list_table(image.compressed_data, image.lzw_min_code_size)
+            actual, broken_reason = lzw.decode(image.compressed_data, image.lzw_min_code_size, pixel_count)
+            if broken_reason is not None or list(actual) != expected:
+                print(f'{in_file}: index streams mismatch at image {image.seek_index}!')
+                return 1
+
+            file_pixels += pixel_count
+            file_old += measure(lambda: decode_list_table(image.compressed_data, image.lzw_min_code_size), args.repeat)
+            file_new += measure(lambda: lzw.decode(image.compressed_data, image.lzw_min_code_size, pixel_count), args.repeat)
+
+        if file_pixels > 0:
+            # small frames and large frames do not speed up alike, so every file is reported
+            print(f'{in_file}: {len(images)} images, {file_pixels} pixels, speedup {file_old / file_new:.2f}x')
+
+        total_pixels += file_pixels
+        total_old += file_old
+        total_new += file_new
+
+    if total_pixels == 0:
+        print('There is no image data!')
+        return 1
+
+    print(f'pixels: {total_pixels}')
+    print(f'list table: {total_old:.4f}s ({total_pixels / total_old / 1e6:.2f} Mpx/s)')
+    print(f'offset table: {total_new:.4f}s ({total_pixels / total_new / 1e6:.2f} Mpx/s)')
+    print(f'speedup: {total_old / total_new:.2f}x')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import sys
+import json
+import time
+import argparse
+import platform
+
+from benchmarks import corpus, memory, stages
+
+
+def run(args):
+    results = {}
+    for name, data in corpus.generate(args.cases).items():
+        results[name] = stages.measure(data, args.repeat)
+        timings = ', '.join(f'{stage} {seconds * 1000:.2f}ms' for stage, seconds in results[name].items())
+        print(f'{name}: {timings}')
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+    with open(args.output, mode='w') as stream:
+        json.dump(report, stream, indent=2)
+    print(f'Results are saved to {args.output}')
+
+    return 0
+
+
+def compare(args):
+    with open(args.baseline) as stream:
+        baseline = json.load(stream)['results']
+    with open(args.current) as stream:
+        current = json.load(stream)['results']
+
+    regressions = 0
+    for name, timings in sorted(current.items()):
+        if name not in baseline:
+            continue
+
+        for stage, seconds in timings.items():
+            base_seconds = baseline[name].get(stage)
+            if base_seconds is None:
+                continue
+
+            change = (seconds - base_seconds) / base_seconds if base_seconds > 0 else 0.0
+            # differences below the noise floor are not regressions whatever the ratio
+            regressed = change > args.threshold and (seconds - base_seconds) > args.min_time
+            if regressed:
+                regressions += 1
+
+            status = 'REGRESSION' if regressed else 'ok'
+            print(f'{name:>16} {stage:>10} {base_seconds * 1000:10.3f}ms -> {seconds * 1000:10.3f}ms {change:+8.1%} {status}')
+
+    if regressions > 0:
+        print(f'{regressions} stage(s) regressed by more than {args.threshold:.0%}!')
+        return 1
+
+    return 0
+
+
+def memory_report(args):
+    print(f'{"case":>16} {"frames":>6} {"pixels":>8} {"before":>12} {"after":>12} {"ratio":>6}')
+    for name, data in corpus.generate(args.cases).items():
+        result = memory.measure(data)
+        ratio = result['before'] / result['after'] if result['after'] > 0 else 0.0
+        print(
+            f'{name:>16} {result["frames"]:>6} {result["pixels"]:>8} '
+            f'{result["before"]:>10.0f} B {result["after"]:>10.0f} B {ratio:>5.1f}x'
+        )
+
+    return 0
+
+
+def write_corpus(args):
+    corpus.write(args.directory, args.cases)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmark the decoding stages on a synthetic GIF corpus',
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='time every stage and save the results as JSON')
+    run_parser.add_argument('--output', type=str, default='bench_output.json', help='the path of the JSON results')
+    run_parser.add_argument('--repeat', type=int, default=3, help='the number of runs, the best one is kept')
+    run_parser.add_argument('--cases', type=str, nargs='+', choices=list(corpus.CASES), default=None, help='only run these cases')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser('compare', help='fail when a stage is slower than in the baseline')
+    compare_parser.add_argument('baseline', type=str, help='the JSON results of the baseline')
+    compare_parser.add_argument('current', type=str, help='the JSON results to check')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='the allowed slowdown ratio (0.1 is 10%%)')
+    compare_parser.add_argument('--min-time', type=float, default=0.0005, help='slowdowns smaller than this (in seconds) are ignored')
+    compare_parser.set_defaults(func=compare)
+
+    memory_parser = subparsers.add_parser('memory', help='report the bytes held per decoded frame before and after the compact block layout')
+    memory_parser.add_argument('--cases', type=str, nargs='+', choices=list(corpus.CASES), default=None, help='only measure these cases')
+    memory_parser.set_defaults(func=memory_report)
+
+    corpus_parser = subparsers.add_parser('corpus', help='write the synthetic GIF files to a directory')
+    corpus_parser.add_argument('directory', type=str)
+    corpus_parser.add_argument('--cases', type=str, nargs='+', choices=list(corpus.CASES), default=None, help='only write these cases')
+    corpus_parser.set_defaults(func=write_corpus)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import os
+import random
+
+from constants import *
+from writer import Frame, encode_gif
+
+
+def color_table(rng: random.Random, num_colors: int):
+    return bytes(rng.randrange(256) for _ in range(3 * num_colors))
+
+
+def pattern(rng: random.Random, width: int, height: int, num_colors: int, frame: int, noise=0.1):
+    """Smooth diagonal bands with some noise, which compresses like ordinary graphics."""
+    indices = []
+    for y in range(height):
+        for x in range(width):
+            if rng.random() < noise:
+                indices.append(rng.randrange(num_colors))
+            else:
+                indices.append(((x + y + frame * 3) // 4) % num_colors)
+    return indices
+
+
+def make_gif(
+    width: int,
+    height: int,
+    num_frames: int,
+    num_colors=256,
+    seed=0,
+    interlaced=False,
+    local_palettes=False,
+    clear_interval=None,
+    frame_size=None,
+    transparent=False,
+):
+    """Generate a deterministic GIF89a animation.
+
+    Args:
+        frame_size: The `(width, height)` of every frame. Smaller frames move over the canvas and use the disposal methods 1, 2 and 3 in turn.
+        transparent: Make color index 0 transparent.
+    """
+    rng = random.Random(seed)
+
+    palette_bits = max(1, (num_colors - 1).bit_length())
+    frame_width, frame_height = frame_size or (width, height)
+
+    global_palette = color_table(rng, 1 << palette_bits)
+
+    frames = []
+    for frame in range(num_frames):
+        if frame_size is None:
+            x = y = 0
+            disposal_method = DISPOSAL_UNSPECIFIED
+        else:
+            x = (frame * 7) % (width - frame_width + 1)
+            y = (frame * 5) % (height - frame_height + 1)
+            disposal_method = 1 + frame % 3
+
+        palette = color_table(rng, 1 << palette_bits) if local_palettes else None
+        indices = pattern(rng, frame_width, frame_height, num_colors, frame)
+        frames.append(Frame(
+            indices,
+            frame_width,
+            frame_height,
+            x,
+            y,
+            palette=palette,
+            delay_time=4,
+            disposal_method=disposal_method,
+            transparent_color=0 if transparent else None,
+            interlaced=interlaced,
+        ))
+
+    # NETSCAPE2.0 looping forever
+    return encode_gif(width, height, frames, global_palette, loop_count=0, clear_interval=clear_interval)
+
+
+# name: arguments of `make_gif`
+CASES = {
+    'tiny_canvas': dict(width=16, height=16, num_frames=1),
+    'huge_canvas': dict(width=1024, height=768, num_frames=1),
+    'many_frames': dict(width=64, height=64, num_frames=200, num_colors=16),
+    'code_size_2': dict(width=256, height=256, num_frames=4, num_colors=4),
+    'code_size_8': dict(width=256, height=256, num_frames=4, num_colors=256),
+    'interlaced': dict(width=256, height=256, num_frames=4, interlaced=True),
+    'local_palettes': dict(width=128, height=128, num_frames=20, local_palettes=True),
+    'frequent_clear': dict(width=256, height=256, num_frames=4, clear_interval=64),
+    'sub_rectangles': dict(width=256, height=256, num_frames=100, num_colors=16, frame_size=(48, 32), transparent=True),
+}
+
+
+def generate(names=None):
+    """Generate the corpus. Returns a `dict` of case name to GIF data."""
+    return {name: make_gif(seed=i, **CASES[name]) for i, name in enumerate(CASES) if names is None or name in names}
+
+
+def write(directory: str, names=None):
+    os.makedirs(directory, exist_ok=True)
+    for name, data in generate(names).items():
+        with open(os.path.join(directory, f'{name}.gif'), mode='wb') as stream:
+            stream.write(data)
@@ -0,0 +1,92 @@
+import sys
+
+from decoder import GIF
+from mappedstream import MappedStream
+from palette import Palette
+from baseblock import BaseBlock
+
+
+def slot_names(obj):
+    """All the slots declared by the classes of a slotted object."""
+    names = []
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        names.extend((slots,) if isinstance(slots, str) else slots)
+    return names
+
+
+def footprint(obj, seen=None):
+    """The bytes held by an object and everything it references, counting every object once.
+
+    Palettes and other blocks (e.g. the `gce` of an image) are shared or accounted for separately, so they are not followed.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        size += sum(footprint(item, seen) for item in obj)
+    elif isinstance(obj, dict):
+        size += sum(footprint(key, seen) + footprint(value, seen) for key, value in obj.items())
+
+    if hasattr(obj, '__dict__'):
+        size += footprint(obj.__dict__, seen)
+    for name in slot_names(obj) if isinstance(obj, BaseBlock) else ():
+        value = getattr(obj, name, None)
+        if not isinstance(value, (BaseBlock, Palette)):
+            size += footprint(value, seen)
+
+    return size
+
+
+class LegacyBlock:
+    """A dict-backed copy of a block, as the blocks were stored before they had slots."""
+
+    def __init__(self, block: BaseBlock):
+        for name in slot_names(block):
+            setattr(self, name, getattr(block, name))
+
+
+def legacy_image(image, compressed_data: bytes):
+    """The previous representation of a decoded image: a dict-backed object which keeps the compressed data next to an index stream stored as a `list` of `int`."""
+    legacy = LegacyBlock(image)
+    legacy.compressed_data = bytes(compressed_data)
+    legacy.index_stream = list(image.index_stream)
+    legacy.local_palette = None
+    legacy.gce = None
+    return legacy
+
+
+def measure(data: bytes):
+    """Measure the memory held by the decoded frames of a GIF in the previous and in the current representation.
+
+    Returns:
+        A `dict` with the number of frames, the pixels per frame and the average bytes per frame `before` and `after` (image block + Graphic Control Extension, palettes excluded).
+    """
+    gif = GIF(MappedStream(data), lazy=True)
+
+    before = 0
+    after = 0
+    pixels = 0
+    for image in gif.images:
+        image.load_compressed_data(gif.stream)
+        compressed_data = image.compressed_data
+        image.decode(gif.stream)
+
+        pixels += image.width * image.height
+        before += footprint(legacy_image(image, compressed_data))
+        after += footprint(image)
+        if image.gce is not None:
+            before += footprint(LegacyBlock(image.gce))
+            after += footprint(image.gce)
+
+    frames = max(len(gif.images), 1)
+    return {
+        'frames': len(gif.images),
+        'pixels': pixels // frames,
+        'before': before / frames,
+        'after': after / frames,
+    }
@@ -0,0 +1,82 @@
+import time
+
+import lzw
+import render
+from bitreader import BitReader
+from compositor import Compositor
+from decoder import GIF
+from mappedstream import MappedStream
+from imageblock import decode_image_data
+
+STAGES = ('header', 'bitreader', 'lzw', 'palette', 'composite')
+
+
+def best_of(func, repeat: int):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def parse(data: bytes):
+    return GIF(MappedStream(data), lazy=True)
+
+
+def read_all_codes(compressed_data: bytes):
+    # Most of the codes of a real image are 12 bits wide, so the whole data is read as 12-bit codes.
+    bit_reader = BitReader(compressed_data, 12)
+    while not bit_reader.ended:
+        bit_reader.read_codes(lzw.BATCH_SIZE)
+
+
+def measure(data: bytes, repeat=3):
+    """Time every decoding stage of a GIF separately.
+
+    Returns:
+        A `dict` of stage name to the best time in seconds.
+    """
+    gif = parse(data)
+
+    images = gif.images
+    for image in images:
+        image.load_compressed_data(gif.stream)
+
+    decoded = [
+        decode_image_data(image.compressed_data, image.lzw_min_code_size, image.width, image.height, image.interlace_flag)[0]
+        for image in images
+    ]
+    luts = []
+    for i, image in enumerate(images):
+        transparent_color = image.gce.transparent_color if image.gce is not None and image.gce.transparent_color_flag else None
+        luts.append((gif.palette(i), transparent_color))
+    frames = [render.render(index_stream, image.width, image.height, palette.lut(transparent_color)) for index_stream, image, (palette, transparent_color) in zip(decoded, images, luts)]
+
+    def bitreader_stage():
+        for image in images:
+            read_all_codes(image.compressed_data)
+
+    def lzw_stage():
+        for image in images:
+            lzw.decode(image.compressed_data, image.lzw_min_code_size, image.width * image.height)
+
+    def palette_stage():
+        for index_stream, image, (palette, transparent_color) in zip(decoded, images, luts):
+            render.render(index_stream, image.width, image.height, palette.lut(transparent_color))
+
+    def composite_stage():
+        compositor = Compositor(gif.width, gif.height)
+        for frame, image in zip(frames, images):
+            if image.gce is None:
+                compositor.apply(frame, image.x, image.y, transparent=False)
+            else:
+                compositor.apply(frame, image.x, image.y, image.gce.disposal_method, image.gce.transparent_color_flag)
+
+    return {
+        'header': best_of(lambda: parse(data), repeat),
+        'bitreader': best_of(bitreader_stage, repeat),
+        'lzw': best_of(lzw_stage, repeat),
+        'palette': best_of(palette_stage, repeat),
+        'composite': best_of(composite_stage, repeat),
+    }
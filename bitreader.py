@@ -0,0 +1,89 @@
+class BitReader:
+    """Read variable-length codes (least significant bit first) from LZW compressed data.
+
+    The reader keeps a wide integer accumulator which is refilled with several bytes at a time from a `memoryview` of the data, so every code costs a single mask and shift.
+
+    Attributes:
+        num_bits: The width of the next code. The LZW decoder increases it while the code table grows.
+        ended: Whether a read has run past the end of the data. The missing bits are read as zeros.
+    """
+
+    # the number of bytes taken from the data on every refill
+    REFILL_SIZE = 8
+
+    def __init__(self, data: bytes, num_bits: int):
+        self.data = memoryview(data)
+        self.index = 0
+        self.init_num_bits = num_bits
+        self.num_bits = self.init_num_bits
+        self.ended = False
+
+        self.buffer = 0
+        self.remain_bits = 0
+
+    def _refill(self, num_bits: int):
+        """Append bytes to the accumulator until it holds at least `num_bits` bits or the data runs out."""
+        num_bytes = max(self.REFILL_SIZE, (num_bits - self.remain_bits + 7) >> 3)
+        chunk = self.data[self.index:self.index + num_bytes]
+        self.index += len(chunk)
+
+        self.buffer |= int.from_bytes(chunk, 'little') << self.remain_bits
+        self.remain_bits += len(chunk) << 3
+
+    def reset(self):
+        self.num_bits = self.init_num_bits
+
+    def tell(self):
+        """The position (in bits) of the next code in the data."""
+        return (self.index << 3) - self.remain_bits
+
+    def seek(self, position: int):
+        """Move to the given position (in bits) in the data."""
+        self.ended = False
+        self.index = position >> 3
+        self.buffer = 0
+        self.remain_bits = 0
+
+        skip_bits = position & 7
+        if skip_bits:
+            self._refill(skip_bits)
+            self.buffer >>= skip_bits
+            self.remain_bits -= skip_bits
+
+    def read(self):
+        num_bits = self.num_bits
+        if self.remain_bits < num_bits:
+            self._refill(num_bits)
+            if self.remain_bits < num_bits:
+                self.ended = True
+                # the missing bits are zeros
+                self.remain_bits = num_bits
+
+        value = self.buffer & ((1 << num_bits) - 1)
+        self.buffer >>= num_bits
+        self.remain_bits -= num_bits
+        return value
+
+    def read_codes(self, count: int):
+        """Read `count` codes of the current width at once.
+
+        The accumulator is refilled once for the whole batch, so this is much cheaper than calling `read()` `count` times. If the data runs out, the last code is padded with zeros, `ended` is set and the remaining codes are not returned: the batch is empty when no bits are left. The caller should only look at `ended` after it has consumed every returned code, as an End of Information code may come before the end of the batch.
+        """
+        num_bits = self.num_bits
+        needed_bits = count * num_bits
+        if self.remain_bits < needed_bits:
+            self._refill(needed_bits)
+            if self.remain_bits < needed_bits:
+                self.ended = True
+                # keep the last partial code, the missing bits are zeros
+                count = -(-self.remain_bits // num_bits)
+                needed_bits = count * num_bits
+                self.remain_bits = needed_bits
+
+        mask = (1 << num_bits) - 1
+        buffer = self.buffer
+        codes = [(buffer >> shift) & mask for shift in range(0, needed_bits, num_bits)]
+
+        self.buffer = buffer >> needed_bits
+        self.remain_bits -= needed_bits
+        return codes
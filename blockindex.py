@@ -0,0 +1,438 @@
+import os
+import sys
+import json
+import time
+import struct
+import hashlib
+import argparse
+import collections.abc
+
+import numpy as np
+
+from baseblock import BaseBlock
+from decoder import GIF
+from applicationblock import ApplicationExtensionBlock
+from commentblock import CommentExtensionBlock
+from graphicblock import GraphicControlExtension
+from imageblock import ImageDescriptorBlock
+from textblock import PlainTextExtensionBlock
+
+MAGIC = b'GIFINDEX'
+VERSION = 2
+
+# the number of bytes at the start of the file hashed into the key of its index
+HASHED_SIZE = 4096
+
+# magic, version, file size, modification time (ns), header hash, width, height, global palette flag, sort flag, background, global palette size, global palette position, broken flag, number of records, number of keyframes, length of the broken reason
+# It is followed by the broken reason, the keyframes (`<u4`) and the records.
+HEADER = struct.Struct('<8sHQq20sHHBBBHQBIIH')
+
+# record types
+GCE = 1
+COMMENT = 2
+TEXT = 3
+APPLICATION = 4
+IMAGE = 5
+
+BLOCK_TYPES = {
+    GraphicControlExtension: GCE,
+    CommentExtensionBlock: COMMENT,
+    PlainTextExtensionBlock: TEXT,
+    ApplicationExtensionBlock: APPLICATION,
+    ImageDescriptorBlock: IMAGE,
+}
+
+# the extensions which are parsed again from their position, only their offsets are stored
+EXTENSIONS = {
+    COMMENT: CommentExtensionBlock,
+    TEXT: PlainTextExtensionBlock,
+    APPLICATION: ApplicationExtensionBlock,
+}
+
+# image flags
+LOCAL_PALETTE = 0b001
+INTERLACED = 0b010
+SORTED = 0b100
+
+# Graphic Control Extension flags
+USER_INPUT = 0b01
+TRANSPARENT = 0b10
+
+# One fixed-size record per block, in data stream order. The fields which do not apply to a block type are 0.
+RECORD = np.dtype([
+    ('type', 'u1'),
+    ('flags', 'u1'),
+    ('lzw_min_code_size', 'u1'),
+    ('disposal_method', 'u1'),
+    ('transparent_color', 'u1'),
+    ('seek_index', '<u8'),
+    ('block_size', '<u4'),
+    ('sub_block_count', '<u4'),
+    ('x', '<u2'),
+    ('y', '<u2'),
+    ('width', '<u2'),
+    ('height', '<u2'),
+    ('delay_time', '<u2'),
+    ('palette_size', '<u2'),
+    ('palette_seek_pos', '<u8'),
+    ('data_seek_pos', '<u8'),
+    # the record of the Graphic Control Extension of an image, -1 if it has none
+    ('gce', '<i4'),
+])
+
+
+def header_hash(stream):
+    """The SHA-1 of the first `HASHED_SIZE` bytes of the data stream. The stream position is not preserved."""
+    stream.seek(0)
+    return hashlib.sha1(stream.read(HASHED_SIZE)).digest()
+
+
+def make_records(blocks: list):
+    """The records of parsed blocks."""
+    records = np.zeros(len(blocks), dtype=RECORD)
+    positions = {id(block): i for i, block in enumerate(blocks)}
+
+    for record, block in zip(records, blocks):
+        record['type'] = BLOCK_TYPES[type(block)]
+        record['seek_index'] = block.seek_index
+        record['block_size'] = block.block_size
+        record['sub_block_count'] = block.sub_block_count
+        record['gce'] = -1
+
+        if isinstance(block, GraphicControlExtension):
+            record['flags'] = (USER_INPUT if block.user_input_flag else 0) | (TRANSPARENT if block.transparent_color_flag else 0)
+            record['disposal_method'] = block.disposal_method
+            record['transparent_color'] = block.transparent_color
+            record['delay_time'] = block.delay_time
+        elif isinstance(block, ImageDescriptorBlock):
+            record['flags'] = (
+                (LOCAL_PALETTE if block.local_palette_flag else 0)
+                | (INTERLACED if block.interlace_flag else 0)
+                | (SORTED if block.sorted else 0)
+            )
+            record['lzw_min_code_size'] = block.lzw_min_code_size
+            record['x'] = block.x
+            record['y'] = block.y
+            record['width'] = block.width
+            record['height'] = block.height
+            record['palette_size'] = block.local_palette_size
+            record['palette_seek_pos'] = block.local_palette_seek_pos
+            record['data_seek_pos'] = block.data_seek_pos
+            if block.gce is not None:
+                record['gce'] = positions[id(block.gce)]
+
+    return records
+
+
+def _new_block(cls, seek_index: int, block_size: int, sub_block_count: int):
+    """A block of `cls` with the fields of `BaseBlock` set, without parsing anything."""
+    block = cls.__new__(cls)
+    BaseBlock.__init__(block, seek_index)
+    block.block_size = block_size
+    block.sub_block_count = sub_block_count
+    block.broken = False
+    return block
+
+
+class IndexedBlocks(collections.abc.Sequence):
+    """The blocks of a `GIF` restored from its index. A block is built from its record the first time it is accessed.
+
+    Args:
+        records: The records as tuples of the `RECORD` fields.
+        stream: The data stream of the `GIF`, the Local Color Tables and the extensions which are not stored in the records are read from it.
+        palettes: The `PaletteCache` of the `GIF`.
+    """
+
+    def __init__(self, records: list, stream, palettes):
+        self.records = records
+        self.stream = stream
+        self.palettes = palettes
+        self._blocks = [None] * len(records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        block = self._blocks[i]
+        if block is None:
+            block = self._blocks[i] = self._build(i)
+        return block
+
+    def built(self):
+        """The blocks built so far."""
+        return [block for block in self._blocks if block is not None]
+
+    def _build(self, i: int):
+        (
+            record_type, flags, lzw_min_code_size, disposal_method, transparent_color,
+            seek_index, block_size, sub_block_count,
+            x, y, width, height, delay_time,
+            palette_size, palette_seek_pos, data_seek_pos, gce,
+        ) = self.records[i]
+
+        if record_type == GCE:
+            block = _new_block(GraphicControlExtension, seek_index, block_size, sub_block_count)
+            block.delay_time = delay_time
+            block.disposal_method = disposal_method
+            block.user_input_flag = bool(flags & USER_INPUT)
+            block.transparent_color_flag = bool(flags & TRANSPARENT)
+            block.transparent_color = transparent_color
+            return block
+
+        if record_type != IMAGE:
+            return EXTENSIONS[record_type](seek_index, self.stream)
+
+        # an image block indexed lazily (see `ImageDescriptorBlock`)
+        block = _new_block(ImageDescriptorBlock, seek_index, block_size, sub_block_count)
+        block.x = x
+        block.y = y
+        block.width = width
+        block.height = height
+        block.local_palette_flag = bool(flags & LOCAL_PALETTE)
+        block.interlace_flag = bool(flags & INTERLACED)
+        block.sorted = bool(flags & SORTED)
+        block.local_palette_size = palette_size
+        block.local_palette_seek_pos = palette_seek_pos
+        block.local_palette = None
+        block.lzw_min_code_size = lzw_min_code_size
+        block.data_seek_pos = data_seek_pos
+        block.compressed_data = None
+        block.index_stream = bytearray()
+        block.decoded = False
+        block.gce = self[gce] if gce >= 0 else None
+
+        if block.local_palette_flag:
+            self.stream.seek(palette_seek_pos)
+            block.local_palette = self.palettes.get(self.stream.read(palette_size))
+
+        return block
+
+
+class IndexedImages(collections.abc.Sequence):
+    """The image blocks of `IndexedBlocks` in display order, built on first access too. It has the interface of `decoder.ImageList`."""
+
+    def __init__(self, blocks: IndexedBlocks, positions: list):
+        self.blocks = blocks
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self.blocks[self.positions[i]]
+
+    def built(self):
+        """The images built so far."""
+        blocks = self.blocks._blocks
+        return [blocks[position] for position in self.positions if blocks[position] is not None]
+
+
+def read_index(path: str, key):
+    """Read and check an index file.
+
+    Returns:
+        A tuple of the header fields, the broken reason, the keyframes and the records (`RECORD` array), `None` if the index is missing, does not belong to `key` or is corrupt.
+    """
+    try:
+        with open(path, mode='rb') as index:
+            file_size = os.fstat(index.fileno()).st_size
+            header = index.read(HEADER.size)
+            if len(header) != HEADER.size:
+                return None
+
+            fields = HEADER.unpack(header)
+            magic, version, size, mtime_ns, digest = fields[:5]
+            broken, count, keyframe_count, reason_length = fields[-4:]
+            if magic != MAGIC or version != VERSION or (size, mtime_ns, digest) != key:
+                return None
+
+            offset = HEADER.size + reason_length + 4 * keyframe_count
+            if file_size != offset + count * RECORD.itemsize:
+                return None
+
+            broken_reason = index.read(reason_length).decode('utf-8') if broken else None
+            keyframes = np.frombuffer(index.read(4 * keyframe_count), dtype='<u4')
+
+        if count > 0:
+            records = np.memmap(path, dtype=RECORD, mode='r', offset=offset, shape=(count,))
+        else:
+            records = np.zeros(0, dtype=RECORD)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        # unreadable or corrupt, the file is parsed again
+        return None
+
+    # every block must be buildable: known types and Graphic Control Extensions which exist
+    types = records['type']
+    if not np.isin(types, list(BLOCK_TYPES.values())).all():
+        return None
+    gces = records['gce'][types == IMAGE]
+    gces = gces[gces >= 0]
+    if (gces >= count).any() or (types[gces] != GCE).any():
+        return None
+    if (keyframes >= np.count_nonzero(types == IMAGE)).any():
+        return None
+
+    return fields, broken_reason, keyframes, records
+
+
+class IndexCache:
+    """Keep the structure of GIF files in a directory, so reopening a file does not walk its block chain again.
+
+    The index of a file holds the Logical Screen Descriptor, the keyframes and one `RECORD` per block: its type, position and size, the image rectangles, flags, palette and image data positions, and the Graphic Control Extension fields. It is named after the file size, the modification time and a hash of the start of the file, and these are checked again when it is loaded. Loading memory-maps the records and converts them at once; the blocks are only built when they are accessed (see `IndexedBlocks`), so opening costs the same for any number of frames and a frame goes straight to its image data with `data_seek_pos`. An index which cannot be read is ignored and the file is parsed again.
+
+    Pass it to `GIF` with `index`. Only the images indexed without decoding (lazy `GIF` objects or several jobs) are restored.
+
+    Args:
+        directory: The cache directory, created if needed.
+
+    Attributes:
+        hits: The number of files restored from their index.
+        misses: The number of files parsed and indexed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _key(self, stream, identity):
+        """The file size, the modification time and the header hash of a file, `None` for streams which are not files."""
+        if identity[0] == 'stream':
+            return None
+
+        _, _, size, mtime_ns = identity
+        return size, mtime_ns, header_hash(stream)
+
+    def _path(self, key):
+        size, mtime_ns, digest = key
+        name = hashlib.sha1(struct.pack('<Qq', size, mtime_ns) + digest).hexdigest()
+        return os.path.join(self.directory, f'{name}.gifindex')
+
+    def load(self, gif: GIF):
+        """Restore the structure and the keyframes of a `GIF` being constructed from its index.
+
+        Returns:
+            Whether a valid index has been found, otherwise the `GIF` is left untouched.
+        """
+        key = self._key(gif.stream, gif.identity)
+        if key is None:
+            return False
+
+        index = read_index(self._path(key), key)
+        if index is None:
+            return False
+
+        fields, broken_reason, keyframes, records = index
+        _, _, _, _, _, width, height, global_palette_flag, sorted_flag, background, global_palette_size, global_palette_seek_pos, broken, _, _, _ = fields
+
+        self.hits += 1
+        stream = gif.stream
+        gif.width = width
+        gif.height = height
+        gif.global_palette_flag = bool(global_palette_flag)
+        gif.sorted = bool(sorted_flag)
+        gif.background = background
+        gif.global_palette_size = global_palette_size
+        gif.global_palette_seek_pos = global_palette_seek_pos
+        if gif.global_palette_flag:
+            stream.seek(global_palette_seek_pos)
+            gif.global_palette = gif.palettes.get(stream.read(global_palette_size))
+
+        gif.blocks = IndexedBlocks(records.tolist(), stream, gif.palettes)
+        gif.images = IndexedImages(gif.blocks, np.flatnonzero(records['type'] == IMAGE).tolist())
+        gif.keyframes = keyframes.tolist()
+        gif.broken = bool(broken)
+        gif.broken_reason = broken_reason
+        return True
+
+    def save(self, gif: GIF):
+        """Write the index of a `GIF` which has just been parsed (without decoding its images)."""
+        key = self._key(gif.stream, gif.identity)
+        if key is None:
+            return
+
+        self.misses += 1
+        size, mtime_ns, digest = key
+        reason = (gif.broken_reason or '').encode('utf-8') if gif.broken else b''
+        keyframes = np.array(gif.keyframes, dtype='<u4')
+        records = make_records(gif.blocks)
+        header = HEADER.pack(
+            MAGIC, VERSION, size, mtime_ns, digest,
+            gif.width, gif.height, gif.global_palette_flag, gif.sorted, gif.background,
+            gif.global_palette_size, gif.global_palette_seek_pos,
+            gif.broken, len(records), len(keyframes), len(reason),
+        )
+
+        path = self._path(key)
+        # write to a temporary file first so that concurrent readers never see a partial index
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, mode='wb') as output:
+            output.write(header)
+            output.write(reason)
+            output.write(keyframes.tobytes())
+            output.write(records.tobytes())
+        os.replace(temporary_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Index the structure of GIF files into a cache directory and print the parse and reopen times as JSON lines',
+    )
+
+    parser.add_argument(
+        'in_files',
+        type=str,
+        nargs='+',
+        help='the paths of GIF files',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        required=True,
+        help='the directory of the indices',
+    )
+
+    args = parser.parse_args()
+
+    cache = IndexCache(args.cache_dir)
+
+    status = 0
+    for in_file in args.in_files:
+        if not os.path.isfile(in_file):
+            print(f'{in_file} is not a file!', file=sys.stderr)
+            status = 1
+            continue
+
+        times = []
+        for _ in range(2):
+            start = time.perf_counter()
+            with open(in_file, mode='rb') as stream:
+                gif = GIF(stream, lazy=True, index=cache)
+            times.append(time.perf_counter() - start)
+
+        result = {
+            'path': in_file,
+            'blocks': len(gif.blocks),
+            'frames': len(gif.images),
+            # the first open builds the index unless it already exists
+            'first_open_time': times[0],
+            'reopen_time': times[1],
+            'broken': gif.broken,
+        }
+        print(json.dumps(result))
+        if gif.broken:
+            status = 1
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
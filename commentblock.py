@@ -6,6 +6,8 @@ from baseblock import BaseBlock
 
 
 class CommentExtensionBlock(BaseBlock):
+    __slots__ = ('comment_data',)
+
     def __init__(self, seek_index: int, stream: io.BufferedReader):
         """The Comment Extension contains text which is not part of the actual graphics in the GIF Data Stream. It is suitable for including comments about the graphics, credits, descriptions or any other type of non-control and non-graphic data.
 
@@ -23,6 +25,7 @@ class CommentExtensionBlock(BaseBlock):
         self.comment_data = []
 
         self._process_data_stream(stream)
+        self._report_parsed()
 
     def _process_data_stream(self, stream: io.BufferedReader):
         stream.seek(self.seek_index)
@@ -31,13 +34,13 @@ class CommentExtensionBlock(BaseBlock):
         bs = self._read(stream)
         if len(bs) != 1:
             # broken data
-            print(f'Lack extension introducer.')
+            self.broken_reason = f'Lack extension introducer.'
             return
 
         ext_intro = bs[0]
         if ext_intro != GIF_EXTENSION_INTRODUCER:
             # broken data
-            print(f'Extension introducer does not equal {GIF_EXTENSION_INTRODUCER}')
+            self.broken_reason = f'Extension introducer does not equal {GIF_EXTENSION_INTRODUCER}'
             return
 
         # 2. Expect Comment Label
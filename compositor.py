@@ -0,0 +1,111 @@
+import numpy as np
+
+from constants import DISPOSAL_RESTORE_TO_BACKGROUND, DISPOSAL_RESTORE_TO_PREVIOUS
+
+
+class Compositor:
+    """Composite frames onto one persistent canvas of the Logical Screen size.
+
+    Frames only touch their own rectangle. The disposal of the previous frame is done lazily when the next frame is applied, and only the previous frame's rectangle is cleared or restored, so the cost of every frame scales with the changed area instead of the screen size.
+
+    Args:
+        width: The Logical Screen Width.
+        height: The Logical Screen Height.
+        background: The RGBA color used to restore to background. Transparent by default like web browsers do.
+
+    Attributes:
+        canvas: The `(height, width, 4)` `uint8` RGBA canvas. It is updated in place, copy it to keep a frame.
+        dirty: The rectangle `(x, y, width, height)` of the canvas changed by the last `apply`, `None` before the first frame.
+    """
+
+    def __init__(self, width: int, height: int, background=(0, 0, 0, 0)):
+        self.width = width
+        self.height = height
+        self.background = np.array(background, dtype=np.uint8)
+        self.canvas = np.empty((height, width, 4), dtype=np.uint8)
+        self.canvas[...] = self.background
+        self.dirty = None
+
+        # disposal of the last applied frame: (disposal method, clipped rectangle, saved pixels)
+        self._pending = None
+
+    def _clip(self, x: int, y: int, width: int, height: int):
+        left = min(max(x, 0), self.width)
+        top = min(max(y, 0), self.height)
+        right = min(max(x + width, 0), self.width)
+        bottom = min(max(y + height, 0), self.height)
+        return left, top, right, bottom
+
+    def _dispose(self):
+        if self._pending is None:
+            return None
+
+        disposal_method, (left, top, right, bottom), saved = self._pending
+        self._pending = None
+
+        if disposal_method == DISPOSAL_RESTORE_TO_BACKGROUND:
+            self.canvas[top:bottom, left:right] = self.background
+        elif disposal_method == DISPOSAL_RESTORE_TO_PREVIOUS:
+            self.canvas[top:bottom, left:right] = saved
+        else:
+            return None
+
+        return left, top, right, bottom
+
+    def apply(self, frame: np.ndarray, x: int, y: int, disposal_method=0, transparent=True):
+        """Dispose the previous frame and draw `frame` at `(x, y)`.
+
+        Args:
+            frame: An `(height, width, 4)` RGBA image (see `render.render`).
+            x: Image Left Position.
+            y: Image Top Position.
+            disposal_method: The disposal method of this frame, applied before the next frame is drawn.
+            transparent: Whether the frame has transparent pixels. Opaque frames are copied without looking at the alpha channel.
+
+        Returns:
+            The canvas.
+        """
+        disposed = self._dispose()
+
+        frame_height, frame_width = frame.shape[:2]
+        left, top, right, bottom = self._clip(x, y, frame_width, frame_height)
+        region = self.canvas[top:bottom, left:right]
+
+        saved = None
+        if disposal_method == DISPOSAL_RESTORE_TO_PREVIOUS:
+            saved = region.copy()
+
+        # the part of the frame inside the canvas
+        pixels = frame[top - y:bottom - y, left - x:right - x]
+        if transparent:
+            np.copyto(region, pixels, where=pixels[..., 3:] != 0)
+        else:
+            region[...] = pixels
+
+        self._pending = (disposal_method, (left, top, right, bottom), saved)
+
+        if disposed is not None:
+            left = min(left, disposed[0])
+            top = min(top, disposed[1])
+            right = max(right, disposed[2])
+            bottom = max(bottom, disposed[3])
+        self.dirty = (left, top, right - left, bottom - top)
+
+        return self.canvas
+
+    def snapshot(self):
+        """Copy the state of the compositor: the canvas and the pending disposal of the last frame. See `restore`."""
+        pending = self._pending
+        if pending is not None and pending[2] is not None:
+            pending = (pending[0], pending[1], pending[2].copy())
+
+        return self.canvas.copy(), pending
+
+    def restore(self, snapshot):
+        """Continue from a state returned by `snapshot`. The snapshot is copied, so it can be restored again."""
+        canvas, pending = snapshot
+        self.canvas[...] = canvas
+        if pending is not None and pending[2] is not None:
+            pending = (pending[0], pending[1], pending[2].copy())
+        self._pending = pending
+        self.dirty = (0, 0, self.width, self.height)
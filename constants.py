@@ -8,3 +8,10 @@ GIF_TXT_EXT_LABEL = 0x01
 GIF_GCE_EXT_LABEL = 0xf9
 GIF_COM_EXT_LABEL = 0xfe
 GIF_APP_EXT_LABEL = 0xff
+# Disposal Methods of the Graphic Control Extension
+DISPOSAL_UNSPECIFIED = 0
+DISPOSAL_DO_NOT_DISPOSE = 1
+DISPOSAL_RESTORE_TO_BACKGROUND = 2
+DISPOSAL_RESTORE_TO_PREVIOUS = 3
+# The largest Logical Screen accepted (in pixels). The 16-bit sizes allow 4G pixels, a canvas that large cannot be allocated.
+MAX_SCREEN_PIXELS = 1 << 27
@@ -1,40 +1,109 @@
 import os
-import time
 import sys
 import argparse
 import io
+import json
 import struct
-
-import numpy as np
-import matplotlib.pyplot as plt
-
+import bisect
+import itertools
+import concurrent.futures
+
+import instrumentation
+import mappedstream
+import render
+from compositor import Compositor
+from keyframes import find_keyframes
+from palette import PaletteCache, EMPTY_PALETTE
 from constants import *
 from applicationblock import ApplicationExtensionBlock
 from commentblock import CommentExtensionBlock
 from graphicblock import GraphicControlExtension
-from imageblock import ImageDescriptorBlock
+from imageblock import ImageDescriptorBlock, decode_image_data
 from textblock import PlainTextExtensionBlock
 
 
+# tokens of the streams which are not files, never reused (unlike `id`, which can be reused once a stream is garbage collected)
+_stream_tokens = itertools.count()
+
+
+def stream_identity(stream):
+    """Identify the file behind a stream by its device, inode, size and modification time. Streams which are not files get a new unique identity on every call."""
+    try:
+        stat = os.fstat(stream.fileno())
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return ('stream', next(_stream_tokens))
+
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class ImageList(list):
+    """The image blocks of a `GIF` parsed from its data stream. `blockindex.IndexedImages` has the same interface for the image blocks restored from an index."""
+
+    def built(self):
+        """The image blocks which exist, all of them."""
+        return self
+
+
 class GIF:
-    def __init__(self, stream: io.BufferedReader):
-        self.stream = stream
+    def __init__(self, stream: io.BufferedReader, lazy=False, cache=None, jobs=1, snapshots=None, index=None):
+        """Parse a GIF data stream.
+
+        Args:
+            stream: The GIF data stream. Files are memory-mapped and parsed without copying, other streams are read as they are. A stream which cannot be memory-mapped must stay open while frames of a lazy `GIF` are accessed.
+            lazy: Only index the blocks and decode the image data when a frame is accessed with `frame` or by iteration. The decoded index streams are kept until `release`, see `stream_frames` to drop them as the iteration goes.
+            cache: A `FrameCache` for the rendered and composited frames. It can be shared between `GIF` objects.
+            jobs: The number of worker processes used to decode the images of a non-lazy `GIF`. With more than one job, all blocks are indexed first and the images are then decoded in parallel (see `decode_all`).
+            snapshots: A `SnapshotStore` which keeps periodic compositor states for `seek`. It belongs to this `GIF` only.
+            index: An `IndexCache` which restores the blocks of a file parsed before instead of walking its block chain, and keeps the index of a new file. It is only used when the images are indexed without decoding (`lazy` or several `jobs`).
+
+        Attributes:
+            identity: The file identity used in the keys of the frame cache.
+            keyframes: The sorted indices of the frames which do not depend on the previous canvas (see `find_keyframes`).
+        """
+        self.identity = stream_identity(stream)
+        self.stream = mappedstream.wrap(stream)
+        self.lazy = lazy
+        self.cache = cache
+        self.jobs = jobs
+        self.snapshots = snapshots
         self.broken = True
+        self.broken_reason = 'The stream has not been processed!'
 
         # all extension blocks
         self.blocks = []
+        # all image blocks in display order
+        self.images = ImageList()
         self.width = 0
         self.height = 0
         self.global_palette_flag = False
         self.global_palette_size = 0
         self.global_palette_seek_pos = 0
+        # the parsed Global Color Table (`Palette`) and the deduplicated Local Color Tables
+        self.global_palette = None
+        self.palettes = PaletteCache()
         self.sorted = False
         self.background = 0
 
-        self._process_data_stream()
+        # the compositor shared by `seek` and `composite` and the number of frames it has applied
+        self._compositor = None
+        self._position = 0
+        # whether the last applied frame has been drawn
+        self._drawn = False
+
+        # an index restores the keyframes too
+        indexed = self.lazy or self.jobs > 1
+        if index is None or not indexed or not index.load(self):
+            self._process_data_stream()
+            self.keyframes = find_keyframes(self.images, self.width, self.height)
+            if index is not None and indexed:
+                index.save(self)
+
+        if not self.lazy and self.jobs > 1 and not self.broken:
+            self.decode_all(self.jobs)
 
     def _process_data_stream(self):
         if not self.stream.seekable():
+            self.broken_reason = 'The stream is not seekable!'
             return
 
         self.stream.seek(0)
@@ -44,11 +113,12 @@ class GIF:
 
         if len(sig) != 6:
             # broken data
-            print(f'Signature is too short')
+            self.broken_reason = f'Signature is too short'
             return
 
         if sig != gif89a_sig:
             # broken or unsupported data
+            self.broken_reason = f'Unsupported signature {bytes(sig)}'
             return
 
         # Parse Logical Screen Descriptor
@@ -56,24 +126,28 @@ class GIF:
         bs = self.stream.read(2)
         if len(bs) != 2:
             # broken data
-            print(f'Lacking 2 bytes for Screen Width')
+            self.broken_reason = f'Lacking 2 bytes for Screen Width'
             return
 
-        self.width = struct.unpack('<h', bs)[0]
+        self.width = struct.unpack('<H', bs)[0]
 
         # 3. Expect Logical Screen Height (2 bytes)
         bs = self.stream.read(2)
         if len(bs) != 2:
             # broken data
-            print(f'Lacking 2 bytes for Screen Height')
+            self.broken_reason = f'Lacking 2 bytes for Screen Height'
             return
 
-        self.height = struct.unpack('<h', bs)[0]
+        self.height = struct.unpack('<H', bs)[0]
+
+        if self.width * self.height > MAX_SCREEN_PIXELS:
+            self.broken_reason = f'The Logical Screen ({self.width}x{self.height}) is larger than {MAX_SCREEN_PIXELS} pixels!'
+            return
 
         # 4. Expect Packed Fields
         bs = self.stream.read(1)
         if len(bs) != 1:
-            print(f'Lacking packed fields')
+            self.broken_reason = f'Lacking packed fields'
             # broken data
             return
 
@@ -96,7 +170,7 @@ class GIF:
         bs = self.stream.read(1)
         if len(bs) != 1:
             # broken data
-            print(f'Lacking background color')
+            self.broken_reason = f'Lacking background color'
             return
 
         self.background = bs[0]
@@ -110,8 +184,14 @@ class GIF:
             bs = self.stream.read(self.global_palette_size)
             if len(bs) != self.global_palette_size:
                 # broken data
+                self.broken_reason = f'Lacking Global Color Table'
                 return
 
+            self.global_palette = self.palettes.get(bs)
+
+        # the Graphic Control Extension applies to the next image only
+        gce = None
+
         # 8. Expect Extension Block or Image Descriptor
         while True:
             # 9. Expect Block Type
@@ -125,7 +205,7 @@ class GIF:
                 # 10. Expect extension type
                 bs = self.stream.read(1)
                 if len(bs) != 1:
-                    print(f'Lacking extension label')
+                    self.broken_reason = f'Lacking extension label'
                     # broken data
                     return
 
@@ -135,87 +215,336 @@ class GIF:
                     # Graphic Control Extension
                     block = GraphicControlExtension(self.stream.tell() - 2, self.stream)
                     if block.broken:
-                        print(block.broken_reason)
+                        self.broken_reason = block.broken_reason
                         return
                     self.blocks.append(block)
+                    gce = block
                 elif sub_type == GIF_COM_EXT_LABEL:
                     # Comment Extension
                     block = CommentExtensionBlock(self.stream.tell() - 2, self.stream)
                     if block.broken:
-                        print(block.broken_reason)
+                        self.broken_reason = block.broken_reason
                         return
                     self.blocks.append(block)
                 elif sub_type == GIF_TXT_EXT_LABEL:
                     # Plain Text Extension
                     block = PlainTextExtensionBlock(self.stream.tell() - 2, self.stream)
                     if block.broken:
-                        print(block.broken_reason)
+                        self.broken_reason = block.broken_reason
                         return
                     self.blocks.append(block)
                 elif sub_type == GIF_APP_EXT_LABEL:
                     # Application Extension
                     block = ApplicationExtensionBlock(self.stream.tell() - 2, self.stream)
                     if block.broken:
-                        print(block.broken_reason)
+                        self.broken_reason = block.broken_reason
                         return
                     self.blocks.append(block)
                 else:
-                    print(f'Unknown extension label')
+                    self.broken_reason = f'Unknown extension label'
                     # broken data
                     return
             elif block_type == GIF_IMAGE_SEPARATOR:
                 # Image Descriptor
-                image = ImageDescriptorBlock(self.stream.tell() - 1, self.stream)
+                # the images are only indexed here when they are decoded in parallel later
+                image = ImageDescriptorBlock(self.stream.tell() - 1, self.stream, lazy=self.lazy or self.jobs > 1, palettes=self.palettes)
                 if image.broken:
-                    print(image.broken_reason)
+                    self.broken_reason = image.broken_reason
                     return
+                image.gce = gce
+                gce = None
                 self.blocks.append(image)
-
-                # save seek position
-                current_pos = self.stream.tell()
-
-                if image.local_palette_flag == 1:
-                    palette = image.load_local_palette(self.stream)
-                else:
-                    palette = self.load_global_palette()
-
-                # restore seek position
-                self.stream.seek(current_pos)
-
-                img = [palette[i] for i in image.index_stream]
-                img = [img[i:i + image.width] for i in range(0, len(image.index_stream), image.width)]
-                plt.imshow(img)
-                plt.show()
+                self.images.append(image)
             else:
                 break
 
         self.broken = False
+        self.broken_reason = None
+
+    def __len__(self):
+        return len(self.images)
+
+    def __iter__(self):
+        for i in range(len(self.images)):
+            yield self.frame(i)
+
+    def stream_frames(self):
+        """Iterate through the decoded image blocks like `iter(gif)`, but keep the memory usage of a lazy `GIF` flat.
+
+        The index stream of an image decoded by this iteration is released as soon as the next image is requested, use it (or copy it) before that. Images which were decoded before are kept.
+        """
+        for i, image in enumerate(self.images):
+            decoded = image.decoded
+            yield self.frame(i)
+
+            if self.lazy and not decoded:
+                image.release()
+
+    def frame(self, i: int):
+        """Get the `i`-th image block with its index stream decoded. Check the `broken` attribute of the returned block."""
+        image = self.images[i]
+        if not image.decoded:
+            position = self.stream.tell()
+            image.decode(self.stream)
+            self.stream.seek(position)
+
+        return image
+
+    def decode_all(self, jobs=None, use_threads=False):
+        """Decode all images which have not been decoded yet on a pool of workers.
+
+        The LZW data of every image only depends on its own `compressed_data` and `lzw_min_code_size`, so the images are decoded independently. The compressed data is read sequentially first, only the decoding runs in parallel.
+
+        Args:
+            jobs: The number of workers, the number of CPUs by default.
+            use_threads: Use threads instead of processes. The decoder is pure Python, so threads only help when the GIL is not the bottleneck.
+
+        Returns:
+            Whether all images have been decoded successfully. Otherwise the `GIF` is marked broken with the reason of the first broken image.
+        """
+        images = [image for image in self.images if not image.decoded and image.load_compressed_data(self.stream)]
+
+        if len(images) > 0:
+            tasks = [
+                (image.compressed_data, image.lzw_min_code_size, image.width, image.height, image.interlace_flag)
+                for image in images
+            ]
+
+            executor_class = concurrent.futures.ThreadPoolExecutor if use_threads else concurrent.futures.ProcessPoolExecutor
+            with executor_class(max_workers=jobs) as executor:
+                results = executor.map(decode_image_data, *zip(*tasks))
+                for image, (index_stream, broken_reason) in zip(images, results):
+                    image.set_index_stream(index_stream, broken_reason)
+
+        for image in self.images:
+            if image.broken:
+                self.broken = True
+                self.broken_reason = image.broken_reason
+                return False
+
+        return True
+
+    def render(self, i: int, alpha=True):
+        """Render the `i`-th image with its own color table.
+
+        Returns:
+            An `(height, width, 4)` (or `(height, width, 3)` without alpha) `uint8` array of the image, or `None` if the image is broken. The transparent color of the Graphic Control Extension has alpha 0. Arrays coming from the frame cache are read-only.
+        """
+        if self.cache is None:
+            return self._render(i, alpha)
+
+        key = (self.identity, i, 'rgba' if alpha else 'rgb')
+        frame = self.cache.get(key)
+        if frame is None:
+            frame = self._render(i, alpha)
+            if frame is not None:
+                self.cache.put(key, frame)
+
+        return frame
+
+    def palette(self, i: int):
+        """The `Palette` used by the `i`-th image: its Local Color Table, the Global Color Table or an empty palette."""
+        image = self.images[i]
+        if image.local_palette is not None:
+            return image.local_palette
+        if self.global_palette is not None:
+            return self.global_palette
+        return EMPTY_PALETTE
+
+    def _render(self, i: int, alpha: bool):
+        image = self.images[i]
+        decoded = image.decoded
+        self.frame(i)
+
+        if image.broken:
+            return None
+
+        transparent_color = None
+        if image.gce is not None and image.gce.transparent_color_flag:
+            transparent_color = image.gce.transparent_color
+
+        lut = self.palette(i).lut(transparent_color, alpha)
+        frame = render.render(image.index_stream, image.width, image.height, lut)
+
+        # the index stream is not needed anymore once the frame is rendered
+        if self.lazy and not decoded:
+            image.release()
+
+        return frame
+
+    def _apply(self, compositor: Compositor, i: int):
+        """Composite the `i`-th image. Returns whether the image has been drawn (broken images are skipped)."""
+        frame = self.render(i)
+        if frame is None:
+            return False
+
+        image = self.images[i]
+        gce = image.gce
+        if gce is None:
+            compositor.apply(frame, image.x, image.y, transparent=False)
+        else:
+            compositor.apply(frame, image.x, image.y, gce.disposal_method, gce.transparent_color_flag)
+
+        return True
+
+    def _composite_to(self, n: int):
+        """Bring the compositor to the state right after frame `n`. Returns whether frame `n` has been drawn.
+
+        The compositor continues from where it is, from the last snapshot or from the last keyframe at or before `n`, whichever applies the fewest frames.
+        """
+        # (number of frames to apply, start)
+        choices = [(n - self.keyframes[bisect.bisect_right(self.keyframes, n) - 1] + 1, 'keyframe')]
+        if self._compositor is not None and self._position <= n + 1:
+            choices.append((n + 1 - self._position, 'current'))
+        if self.snapshots is not None:
+            snapshot_index = self.snapshots.before(n)
+            if snapshot_index is not None:
+                choices.append((n - snapshot_index, 'snapshot'))
+
+        # on ties, prefer continuing over restoring a snapshot over starting again
+        _, start = min(choices, key=lambda choice: (choice[0], ('current', 'snapshot', 'keyframe').index(choice[1])))
+
+        if start == 'keyframe':
+            self._compositor = Compositor(self.width, self.height)
+            self._position = self.keyframes[bisect.bisect_right(self.keyframes, n) - 1]
+        elif start == 'snapshot':
+            snapshot, self._drawn = self.snapshots.get(snapshot_index)
+            if self._compositor is None:
+                self._compositor = Compositor(self.width, self.height)
+            self._compositor.restore(snapshot)
+            self._position = snapshot_index + 1
+
+        while self._position <= n:
+            i = self._position
+            self._drawn = self._apply(self._compositor, i)
+            self._position += 1
+
+            if self.snapshots is not None and self.snapshots.wants(i):
+                self.snapshots.put(i, self._compositor.snapshot(), self._drawn)
+
+        return self._drawn
+
+    def seek(self, n: int):
+        """Composite frame `n` onto the Logical Screen, replaying only the frames since the nearest keyframe or snapshot.
+
+        Returns:
+            The `(height, width, 4)` canvas after frame `n`, or `None` if the image is broken. Without a frame cache the canvas is updated in place by the next `seek`, copy it to keep a frame. With a frame cache, a read-only copy is returned and cached.
+        """
+        if not 0 <= n < len(self.images):
+            raise IndexError(f'Frame {n} is out of range ({len(self.images)} frames)!')
+
+        if self.cache is not None:
+            key = (self.identity, n, 'canvas')
+            canvas = self.cache.get(key)
+            if canvas is not None:
+                return canvas
+
+        if not self._composite_to(n):
+            return None
+
+        canvas = self._compositor.canvas
+        if self.cache is not None:
+            canvas = canvas.copy()
+            self.cache.put(key, canvas)
+
+        return canvas
+
+    def composite(self):
+        """Iterate through the frames composited onto the Logical Screen.
+
+        Yields:
+            The `(height, width, 4)` canvas after each frame (see `seek`). Broken images are skipped.
+        """
+        for i in range(len(self.images)):
+            canvas = self.seek(i)
+            if canvas is not None:
+                yield canvas
+
+    def reverse(self):
+        """Iterate through the composited frames from the last one to the first one (see `seek`). Every frame is composited from the nearest keyframe or snapshot before it."""
+        for i in range(len(self.images) - 1, -1, -1):
+            canvas = self.seek(i)
+            if canvas is not None:
+                yield canvas
+
+    def release(self):
+        """Drop the compositor state, the snapshots and the index streams of a lazy `GIF` to save memory. Everything is decoded again when needed."""
+        self._compositor = None
+        self._position = 0
+        self._drawn = False
+
+        if self.snapshots is not None:
+            self.snapshots.clear()
+
+        if self.lazy:
+            # the images restored from an index which have not been accessed have nothing to release
+            for image in self.images.built():
+                if image.decoded:
+                    image.release()
 
     def load_global_palette(self):
-        self.stream.seek(self.global_palette_seek_pos)
+        """The Global Color Table as a list of `[r, g, b]` lists. It has been parsed with the header, the stream is not read."""
+        if self.global_palette is None:
+            return []
 
-        bs = self.stream.read(self.global_palette_size)
-        palette = [[*bs[i:i + 3]] for i in range(0, self.global_palette_size, 3)]
-        return palette
+        return self.global_palette.tolist()
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('infile', type=str)
+    parser.add_argument(
+        'infiles',
+        type=str,
+        nargs='+',
+        help='GIF files, directories or glob patterns',
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=None,
+        help='decode in batch mode on this many processes (defaults to the number of CPUs in batch mode)',
+    )
+    parser.add_argument(
+        '--trace',
+        type=str,
+        default=None,
+        help='write the parsing and decoding events of a single file as a Chrome trace JSON file',
+    )
+    parser.add_argument(
+        '--counters',
+        action='store_true',
+        help='print the parsing and decoding counters of a single file as JSON',
+    )
 
     args = parser.parse_args()
 
-    if not os.path.exists(args.infile):
-        print(f'{args.infile} does not exists!')
-        return 1
+    # batch mode writes one JSON line per file
+    if args.jobs is not None or len(args.infiles) > 1 or not os.path.isfile(args.infiles[0]):
+        import batch
 
-    if not os.path.isfile(args.infile):
-        print(f'{args.infile} is not a file!')
-        return 1
+        jobs = args.jobs if args.jobs is not None else os.cpu_count()
+        failures = batch.run(args.infiles, jobs)
+        return 1 if failures else 0
+
+    recorder = None
+    if args.trace is not None or args.counters:
+        recorder = instrumentation.Recorder()
+        instrumentation.set_hook(recorder)
 
-    with open(args.infile, mode='rb') as stream:
+    infile = args.infiles[0]
+    with open(infile, mode='rb') as stream:
         gif = GIF(stream)
 
+    if recorder is not None:
+        if args.trace is not None:
+            recorder.write_chrome_trace(args.trace)
+        if args.counters:
+            print(json.dumps(recorder.counters(), indent=2))
+
+    if gif.broken:
+        print(gif.broken_reason)
+        return 1
+
     return 0
 
 
@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from decoder import GIF
+from probe import gif_loop_count
+
+
+def sidecar_path(path: str):
+    """The path of the JSON sidecar of a `.npy` frame stack."""
+    return os.path.splitext(path)[0] + '.json'
+
+
+def frame_metadata(gif: GIF, i: int):
+    """The timing and placement of the `i`-th image as a JSON serializable `dict`."""
+    image = gif.images[i]
+    gce = image.gce
+    return {
+        'index': i,
+        # in hundredths of a second, as stored in the file
+        'delay': gce.delay_time if gce is not None else 0,
+        'disposal': gce.disposal_method if gce is not None else 0,
+        'transparent': bool(gce is not None and gce.transparent_color_flag),
+        'x': image.x,
+        'y': image.y,
+        'width': image.width,
+        'height': image.height,
+        'broken': image.broken,
+    }
+
+
+def export_frames(gif: GIF, path: str, alpha=True):
+    """Write the composited frames of a `GIF` to a `.npy` file of shape `(N, height, width, C)` and its JSON sidecar.
+
+    The frames are composited one at a time straight into a preallocated memory-mapped file, so only the compositor canvas is held in memory; use a lazy `GIF` to also release the index streams after each frame. There is one frame per image: a broken image repeats the previous frame and is marked `broken` in the sidecar, so frame `i` of the stack is always image `i`. Both files are written under temporary names first, readers never see a partial export.
+
+    The stack is read back without decoding with `load_frames`, or `numpy.load(path, mmap_mode='r')`.
+
+    Args:
+        gif: The `GIF` to export.
+        path: The `.npy` file. The sidecar goes next to it (see `sidecar_path`).
+        alpha: Keep the alpha channel (`C = 4`), otherwise only RGB is stored (`C = 3`).
+
+    Returns:
+        The sidecar content: the shape of the stack, the loop count and the `frame_metadata` of every frame.
+    """
+    channels = 4 if alpha else 3
+    shape = (len(gif.images), gif.height, gif.width, channels)
+
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    if 0 in shape:
+        # an empty file cannot be memory-mapped
+        np.save(temporary_path, np.zeros(shape, dtype=np.uint8), allow_pickle=False)
+        os.replace(f'{temporary_path}.npy', path)
+    else:
+        frames = np.lib.format.open_memmap(temporary_path, mode='w+', dtype=np.uint8, shape=shape)
+        for i in range(len(gif.images)):
+            canvas = gif.seek(i)
+            if canvas is not None:
+                frames[i] = canvas[..., :channels]
+            elif i > 0:
+                frames[i] = frames[i - 1]
+
+        frames.flush()
+        del frames
+        os.replace(temporary_path, path)
+
+    metadata = {
+        'width': gif.width,
+        'height': gif.height,
+        'shape': list(shape),
+        'dtype': 'uint8',
+        'channels': 'RGBA' if alpha else 'RGB',
+        'loop_count': gif_loop_count(gif),
+        'broken': gif.broken,
+        'broken_reason': gif.broken_reason,
+        'frames': [frame_metadata(gif, i) for i in range(len(gif.images))],
+    }
+
+    metadata_path = sidecar_path(path)
+    temporary_path = f'{metadata_path}.{os.getpid()}.tmp'
+    with open(temporary_path, mode='w') as output:
+        json.dump(metadata, output)
+    os.replace(temporary_path, metadata_path)
+
+    return metadata
+
+
+def load_frames(path: str, mmap_mode='r'):
+    """Memory-map a frame stack written by `export_frames`.
+
+    Returns:
+        A tuple of the `(N, height, width, C)` array and the sidecar `dict`.
+    """
+    with open(sidecar_path(path)) as sidecar:
+        metadata = json.load(sidecar)
+    return np.load(path, mmap_mode=mmap_mode), metadata
+
+
+def export_file(in_file: str, out_file: str, alpha=True):
+    """Export a GIF file (see `export_frames`). Returns a JSON serializable summary."""
+    start = time.perf_counter()
+    with open(in_file, mode='rb') as stream:
+        gif = GIF(stream, lazy=True)
+        metadata = export_frames(gif, out_file, alpha)
+
+    return {
+        'path': in_file,
+        'output': out_file,
+        'shape': metadata['shape'],
+        'broken_frames': sum(frame['broken'] for frame in metadata['frames']),
+        'broken': metadata['broken'],
+        'time': time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Export the composited frames of GIF files to memory-mappable .npy files with JSON sidecars and print a summary as JSON lines',
+    )
+
+    parser.add_argument(
+        'in_files',
+        type=str,
+        nargs='+',
+        help='the paths of GIF files',
+    )
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        required=True,
+        help='the directory of the .npy and .json files',
+    )
+    parser.add_argument(
+        '--no-alpha',
+        action='store_true',
+        help='store RGB frames instead of RGBA frames',
+    )
+
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    status = 0
+    for in_file in args.in_files:
+        if not os.path.isfile(in_file):
+            print(f'{in_file} is not a file!', file=sys.stderr)
+            status = 1
+            continue
+
+        name = os.path.splitext(os.path.basename(in_file))[0]
+        result = export_file(in_file, os.path.join(args.output_dir, f'{name}.npy'), not args.no_alpha)
+        print(json.dumps(result))
+        if result['broken']:
+            status = 1
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
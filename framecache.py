@@ -0,0 +1,81 @@
+import threading
+import collections
+
+import numpy as np
+
+# 64 MiB
+DEFAULT_BUDGET = 64 * 1024 * 1024
+
+
+class FrameCache:
+    """A least recently used cache of decoded frames with a memory budget in bytes.
+
+    Keys are `(file identity, frame index, output format)` tuples (see `GIF.identity`), so one cache can be shared by several `GIF` objects, including objects opened on the same file again, and by several threads. Cached arrays are made read-only.
+
+    Attributes:
+        budget: The maximum number of bytes of all cached arrays.
+        size: The number of bytes of all cached arrays.
+        hits: The number of `get` calls which found the frame.
+        misses: The number of `get` calls which did not find the frame.
+        evictions: The number of frames dropped to stay within the budget.
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.frames = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __contains__(self, key):
+        return key in self.frames
+
+    def get(self, key):
+        with self._lock:
+            frame = self.frames.get(key)
+            if frame is None:
+                self.misses += 1
+                return None
+
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def put(self, key, frame: np.ndarray):
+        """Store a frame. Frames larger than the whole budget are not cached."""
+        if frame.nbytes > self.budget:
+            return
+
+        frame.flags.writeable = False
+        with self._lock:
+            if key in self.frames:
+                self.size -= self.frames.pop(key).nbytes
+
+            self.frames[key] = frame
+            self.size += frame.nbytes
+
+            while self.size > self.budget:
+                _, evicted = self.frames.popitem(last=False)
+                self.size -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.frames.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'frames': len(self.frames),
+                'size': self.size,
+                'budget': self.budget,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -1,17 +1,71 @@
 import os
-import time
 
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.core.window import Window
+from kivy.graphics.texture import Texture
+from kivy.uix.image import Image
+
+from decoder import GIF
+from keyframes import SnapshotStore
+from player import Player
 
 
 class GifPlayerApp(App):
+    """Play the GIF file dropped on the window. The timing and the decoding are done by `Player`, this only shows its frames."""
 
     def build(self):
+        self.player = None
+        self.texture = None
+        self.event = None
+
         Window.bind(on_dropfile=self.on_dropfile)
+        self.image = Image(allow_stretch=True)
+        return self.image
+
+    def on_dropfile(self, window, file_path: bytes, *args):
+        path = file_path.decode('utf-8') if isinstance(file_path, bytes) else file_path
+        if not os.path.isfile(path):
+            return
+
+        with open(path, mode='rb') as stream:
+            gif = GIF(stream, lazy=True, snapshots=SnapshotStore())
+        if gif.broken or len(gif) == 0:
+            Window.set_title(f'{os.path.basename(path)} is broken: {gif.broken_reason}')
+            return
+
+        self.stop_player()
+        Window.set_title(os.path.basename(path))
+
+        self.texture = Texture.create(size=(gif.width, gif.height), colorfmt='rgba')
+        # the canvas rows go from top to bottom, the texture rows from bottom to top
+        self.texture.flip_vertical()
+        self.image.texture = self.texture
+
+        self.player = Player(gif)
+        self.player.play()
+        self.event = Clock.schedule_once(self.tick, 0)
+
+    def tick(self, dt):
+        frame = self.player.update()
+        if frame is not None:
+            self.texture.blit_buffer(frame.canvas.tobytes(), colorfmt='rgba', bufferfmt='ubyte')
+            self.image.canvas.ask_update()
+
+        wait = self.player.time_until_next()
+        if wait is not None:
+            self.event = Clock.schedule_once(self.tick, wait)
+
+    def stop_player(self):
+        if self.event is not None:
+            self.event.cancel()
+            self.event = None
+        if self.player is not None:
+            self.player.stop()
+            self.player = None
 
-    def on_dropfile(self, *args, **kwargs):
-        print(args, kwargs)
+    def on_stop(self):
+        self.stop_player()
 
 
 if __name__ == '__main__':
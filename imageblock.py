@@ -1,65 +1,85 @@
 import io
 import struct
+import functools
 
+import numpy as np
+
+import lzw
 from constants import GIF_IMAGE_SEPARATOR
 from baseblock import BaseBlock
+from palette import Palette, PaletteCache
+
+
+# (first row, step) of the four passes of an interlaced image
+INTERLACE_PASSES = ((0, 8), (4, 8), (2, 4), (1, 2))
 
 
-class BitReader:
-    def __init__(self, data: bytes, num_bits: int):
-        self.data = data
-        self.index = 0
-        self.init_num_bits = num_bits
-        self.num_bits = self.init_num_bits
-        self.ended = False
+@functools.lru_cache(maxsize=64)
+def interlace_rows(height: int):
+    """For every display row, the row of the interlaced index stream which holds it."""
+    order = np.concatenate([np.arange(start, height, step) for start, step in INTERLACE_PASSES])
+    rows = np.empty(height, dtype=np.intp)
+    rows[order] = np.arange(height)
+    rows.flags.writeable = False
+    return rows
 
-        self.buffer = self.data[self.index]
-        self.remain_bits_from_current_byte = 8
-        self.index += 1
 
-    def _next(self):
-        if self.index < len(self.data):
-            self.buffer = self.data[self.index]
-            self.index += 1
-            self.remain_bits_from_current_byte = 8
-        else:
-            self.ended = True
-            self.buffer = 0
-            print(f'Ran out of data!')
+def deinterlace(index_stream: bytearray, width: int, height: int):
+    """Reorder the rows of an interlaced index stream into display order with a single gather."""
+    stored = np.frombuffer(index_stream, dtype=np.uint8).reshape(height, width)
+    result = bytearray(width * height)
+    np.take(stored, interlace_rows(height), axis=0, out=np.frombuffer(result, dtype=np.uint8).reshape(height, width))
+    return result
 
-    def reset(self):
-        self.num_bits = self.init_num_bits
 
-    def read(self):
-        value = 0
-        remain_bits_for_this_value = self.num_bits
+def interlace(index_stream: bytes, width: int, height: int):
+    """Reorder the rows of an index stream in display order into the interlaced order, the inverse of `deinterlace`."""
+    shown = np.frombuffer(index_stream, dtype=np.uint8).reshape(height, width)
+    result = bytearray(width * height)
+    np.frombuffer(result, dtype=np.uint8).reshape(height, width)[interlace_rows(height)] = shown
+    return result
 
-        while remain_bits_for_this_value != 0:
-            if self.remain_bits_from_current_byte == 0:
-                self._next()
 
-            if remain_bits_for_this_value >= self.remain_bits_from_current_byte:
-                value += (self.buffer << (self.num_bits - remain_bits_for_this_value))
-                remain_bits_for_this_value -= self.remain_bits_from_current_byte
-                self.remain_bits_from_current_byte = 0
-            else:
-                temp_value = self.buffer << (8 - remain_bits_for_this_value)
-                temp_value = temp_value & 0xff
-                temp_value = temp_value >> (8 - remain_bits_for_this_value)
-                temp_value = temp_value << (self.num_bits - remain_bits_for_this_value)
-                value += temp_value
+def decode_image_data(compressed_data: bytes, lzw_min_code_size: int, width: int, height: int, interlaced: bool):
+    """Decode the image data into an index stream in display order.
 
-                # subtract taken value from buffer
-                self.buffer = self.buffer >> remain_bits_for_this_value
-                self.remain_bits_from_current_byte -= remain_bits_for_this_value
+    It only depends on its arguments, so images can be decoded in parallel in worker processes.
 
-                remain_bits_for_this_value = 0
+    Returns:
+        A tuple of the index stream (`bytearray`) and the broken reason (`None` if the whole image has been decoded).
+    """
+    index_stream, broken_reason = lzw.decode(compressed_data, lzw_min_code_size, width * height)
 
-        return value
+    if broken_reason is None and interlaced:
+        index_stream = deinterlace(index_stream, width, height)
+
+    return index_stream, broken_reason
 
 
 class ImageDescriptorBlock(BaseBlock):
-    def __init__(self, seek_index: int, stream: io.BufferedReader):
+    __slots__ = (
+        'x', 'y', 'width', 'height',
+        'local_palette_flag', 'sorted', 'interlace_flag', 'local_palette_size', 'local_palette_seek_pos', 'local_palette',
+        'lzw_min_code_size', 'data_seek_pos', 'compressed_data', 'index_stream', 'decoded', 'gce',
+    )
+
+    def __init__(self, seek_index: int, stream: io.BufferedReader, lazy=False, palettes=None):
+        """Each image in the Data Stream is composed of an Image Descriptor, an optional Local Color Table, and the image data.
+
+        Args:
+            seek_index: The start index of the block in the data stream.
+            stream: The data stream that contains the block. The stream will not be closed by any methods belong to this object.
+            lazy: Only walk through the image data sub-blocks without decoding them. Call `decode` to get the index stream later.
+            palettes: The `PaletteCache` which deduplicates the Local Color Tables of the data stream.
+
+        Attributes:
+            local_palette: The parsed Local Color Table (`Palette`), `None` if the image uses the Global Color Table.
+            data_seek_pos: The position of the first image data sub-block in the data stream.
+            compressed_data: The LZW data (`bytearray`) loaded by `load_compressed_data`, `None` when it has not been loaded or once it has been decoded.
+            index_stream: The color indices in display order, one byte per pixel (`bytearray`).
+            decoded: Whether the image data has been decoded into `index_stream`.
+            gce: The Graphic Control Extension which applies to this image, set by the `GIF` object.
+        """
         super().__init__(seek_index)
         self.x = 0
         self.y = 0
@@ -70,12 +90,18 @@ class ImageDescriptorBlock(BaseBlock):
         self.interlace_flag = False
         self.local_palette_size = 0
         self.local_palette_seek_pos = 0
-        self.compressed_data = []
-        self.index_stream = []
-
-        self._process_data_stream(stream)
-
-    def _process_data_stream(self, stream: io.BufferedReader):
+        self.local_palette = None
+        self.lzw_min_code_size = 0
+        self.data_seek_pos = 0
+        self.compressed_data = None
+        self.index_stream = bytearray()
+        self.decoded = False
+        self.gce = None
+
+        self._process_data_stream(stream, lazy, palettes)
+        self._report_parsed()
+
+    def _process_data_stream(self, stream: io.BufferedReader, lazy: bool, palettes: PaletteCache):
         stream.seek(self.seek_index)
 
         # 1. Expect Image Separator
@@ -97,7 +123,7 @@ class ImageDescriptorBlock(BaseBlock):
             # broken data
             return
 
-        self.x = struct.unpack('<h', bs)[0]
+        self.x = struct.unpack('<H', bs)[0]
 
         # 4. Expect Image Top Position (2 bytes)
         bs = self._read(stream, 2)
@@ -105,7 +131,7 @@ class ImageDescriptorBlock(BaseBlock):
             # broken data
             return
 
-        self.y = struct.unpack('<h', bs)[0]
+        self.y = struct.unpack('<H', bs)[0]
 
         # 5. Expect Image Width (2 bytes)
         bs = self._read(stream, 2)
@@ -113,7 +139,7 @@ class ImageDescriptorBlock(BaseBlock):
             # broken data
             return
 
-        self.width = struct.unpack('<h', bs)[0]
+        self.width = struct.unpack('<H', bs)[0]
 
         # 6. Expect Image Height (2 bytes)
         bs = self._read(stream, 2)
@@ -121,7 +147,7 @@ class ImageDescriptorBlock(BaseBlock):
             # broken data
             return
 
-        self.height = struct.unpack('<h', bs)[0]
+        self.height = struct.unpack('<H', bs)[0]
 
         # 7. Expect Packed Fields
         bs = self._read(stream)
@@ -156,12 +182,14 @@ class ImageDescriptorBlock(BaseBlock):
             self.local_palette_seek_pos = self.seek_index + self.block_size
 
             # 10. Expect Local Color Table data
-            # We just walk through the data but not storing it as it may be memory intensive with unknown number of Local Color Tables. The Local Color Table data should only be loaded when we need to render the image.
+            # Identical Local Color Tables share one parsed `Palette`, so storing them stays cheap even with one table per frame.
             bs = self._read(stream, self.local_palette_size)
             if len(bs) != self.local_palette_size:
                 # broken data
                 return
 
+            self.local_palette = palettes.get(bs) if palettes is not None else Palette(bs)
+
         # 11. Expect Image Data
         # 11.1 Expect LZW Minimum Code Size
         bs = self._read(stream)
@@ -169,114 +197,96 @@ class ImageDescriptorBlock(BaseBlock):
             return
         self.lzw_min_code_size = bs[0]
 
-        # 11.2 Expect LZW compressed Image Data
-        compressed_data, sb_broken = self.load_data_sub_blocks(stream)
-        if sb_broken:
+        # color tables have at most 256 entries so every index fits in a byte
+        if not 1 <= self.lzw_min_code_size <= 8:
+            self.broken_reason = f'LZW Minimum Code Size ({self.lzw_min_code_size}) is out of range!'
             return
 
-        # TODO Extract LZW compressed Image Data
-        compressed_data = b''.join(compressed_data)
-        self.compressed_data = compressed_data
+        # 11.2 Expect LZW compressed Image Data
+        self.data_seek_pos = self.seek_index + self.block_size
 
-        code_stream = []
+        if lazy:
+            if self.skip_data_sub_blocks(stream):
+                return
 
-        # Sample 5 bits each pixel index
-        # bbbaaaaa
-        # dcccccbb
-        # eeeedddd
-        # ggfffffe
-        # hhhhhggg
+            self.broken = False
+            return
 
-        num_bits = self.lzw_min_code_size + 1
-        bit_reader = BitReader(self.compressed_data, num_bits)
+        compressed_data, sb_broken = self.gather_data_sub_blocks(stream)
+        if sb_broken:
+            return
 
-        clear_code = 2 ** self.lzw_min_code_size
-        eoi_code = clear_code + 1
+        self._decode_compressed_data(compressed_data)
+
+    def _decode_compressed_data(self, compressed_data: bytearray):
+        # 11.3 Decode LZW compressed Image Data
+        index_stream, broken_reason = decode_image_data(
+            compressed_data,
+            self.lzw_min_code_size,
+            self.width,
+            self.height,
+            self.interlace_flag,
+        )
+        self.set_index_stream(index_stream, broken_reason)
+
+    def load_compressed_data(self, stream: io.BufferedReader):
+        """Load the image data of a block which has been parsed lazily into `compressed_data` without decoding it. It is dropped again when the index stream is set. The stream position is not preserved.
+
+        Returns:
+            Whether the image data is available.
+        """
+        if self.broken:
+            return False
+
+        if self.compressed_data is None:
+            stream.seek(self.data_seek_pos)
+
+            # the sub-blocks have already been counted while indexing the image
+            block_size = self.block_size
+            sub_block_count = self.sub_block_count
+            compressed_data, sb_broken = self.gather_data_sub_blocks(stream)
+            self.block_size = block_size
+            self.sub_block_count = sub_block_count
+
+            if sb_broken:
+                self.broken = True
+                self.broken_reason = 'The image data sub-blocks are broken!'
+                return False
+
+            self.compressed_data = compressed_data
+
+        return True
+
+    def set_index_stream(self, index_stream: bytearray, broken_reason=None):
+        """Store the result of `decode_image_data` (which may have run somewhere else, e.g. in a worker process)."""
+        self.index_stream = index_stream
+        # the image can be decoded again from the stream, the compressed data is not kept next to the pixels
+        self.compressed_data = None
+        self.decoded = True
 
-        # decode LZW code stream
-        # the first code should be clear code
-        code = bit_reader.read()
-        if code != clear_code:
+        if broken_reason is not None:
             self.broken = True
-            self.broken_reason = f'The first code ({code}) does not equal clear code ({clear_code})!'
-
-        index_stream = []
-
-        # initialize code table
-        code_table = [[x] for x in range(clear_code)]
-        # Pad clear_code and eoi_code
-        code_table.append([clear_code])
-        code_table.append([eoi_code])
-
-        code_table_limit = (1 << bit_reader.num_bits) - 1
-
-        # let CODE be the first code in the code stream
-        code = bit_reader.read()
-
-        if not code < clear_code:
-            self.broken_reason = f'The first code in the code stream is out of range ({code} vs {clear_code})!'
+            self.broken_reason = broken_reason
             return
 
-        # output {CODE} to index stream
-        index_stream.extend(code_table[code])
-
-        while True:
-            previous_code = code
-
-            #  let CODE be the next code in the code stream
-            code = bit_reader.read()
-
-            if code == eoi_code:
-                break
-            if code == clear_code:
-                # re-initialize code table
-                code_table = code_table[:eoi_code + 1]
-                bit_reader.reset()
-                code_table_limit = (1 << bit_reader.num_bits) - 1
-                code = bit_reader.read()
-                index_stream.append(code)
-                continue
-
-            # is CODE in the code table?
-            if code < len(code_table):
-                # yes
-                # output {CODE} to index stream
-                index_stream.extend(code_table[code])
-                # let K be the first index in {CODE}
-                k = code_table[code][0]
-                # add {CODE-1}+K to code table
-                indices = [*code_table[previous_code], k]
-                code_table.append(indices)
-            else:
-                # no
-                # let K be the first index of {CODE-1}
-                k = code_table[previous_code][0]
-
-                # output {CODE-1}+K to index stream
-                indices = [*code_table[previous_code], k]
-                index_stream.extend(indices)
-
-                # add {CODE-1}+K to code table
-                code_table.append(indices)
-
-            if (len(code_table) > code_table_limit) and (bit_reader.num_bits < 12):
-                bit_reader.num_bits += 1
-                code_table_limit = (1 << bit_reader.num_bits) - 1
-
-            if bit_reader.ended:
-                print(f'There is no End of Information code!')
-                break
+        self.broken = False
 
-        self.index_stream = index_stream
-        if not len(self.index_stream) == (self.width * self.height):
-            self.broken_reason = f'Not enough image data! {len(self.index_stream)}/{self.width * self.height}'
+    def decode(self, stream: io.BufferedReader):
+        """Load and decode the image data of a block which has been parsed lazily. The stream position is not preserved."""
+        if self.decoded or not self.load_compressed_data(stream):
             return
 
-        self.broken = False
+        self._decode_compressed_data(self.compressed_data)
+
+    def release(self):
+        """Drop the decoded data to save memory. The image can be decoded again with `decode`."""
+        self.compressed_data = None
+        self.index_stream = bytearray()
+        self.decoded = False
 
     def load_local_palette(self, stream: io.BufferedReader):
-        stream.seek(self.local_palette_seek_pos)
+        """The Local Color Table as a list of `[r, g, b]` lists. It has been parsed with the block, the stream is not read."""
+        if self.local_palette is None:
+            return []
 
-        bs = stream.read(self.local_palette_size)
-        palette = [[*bs[i:i + 3]] for i in range(0, self.local_palette_size, 3)]
-        return palette
+        return self.local_palette.tolist()
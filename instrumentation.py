@@ -0,0 +1,101 @@
+import os
+import json
+import time
+import threading
+import collections
+
+
+class Instrumentation:
+    """The instrumentation hook of the parsers and the decoder.
+
+    This default hook does nothing. The instrumented code checks `enabled` before taking any timestamp or building any event, so the default costs one attribute lookup per block.
+    """
+
+    enabled = False
+
+    def event(self, name: str, category: str, start: float, end: float, **args):
+        """Record a finished operation.
+
+        Args:
+            name: The operation, e.g. the block class name or `lzw`.
+            category: `block` for parsed blocks, `decode` for image data decoding, `encode` for image data encoding.
+            start: `time.perf_counter()` at the start of the operation.
+            end: `time.perf_counter()` at the end of the operation.
+            args: Structured fields of the operation (bytes consumed, sub-block count, LZW codes, ...).
+        """
+        pass
+
+
+class Recorder(Instrumentation):
+    """Keep every event in memory and export them as counters or as a Chrome trace.
+
+    Attributes:
+        events: `(name, category, start, end, thread id, args)` tuples.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def event(self, name: str, category: str, start: float, end: float, **args):
+        with self._lock:
+            self.events.append((name, category, start, end, threading.get_ident(), args))
+
+    def counters(self):
+        """Aggregate the events by name.
+
+        Returns:
+            A `dict` of event name to `count`, `time` (seconds) and the sums of every numeric field (e.g. `block_size`, `sub_blocks`, `codes`, `clear_codes`).
+        """
+        counters = collections.defaultdict(lambda: collections.defaultdict(int))
+        for name, _, start, end, _, args in self.events:
+            counter = counters[name]
+            counter['count'] += 1
+            counter['time'] += end - start
+            for key, value in args.items():
+                # positions do not add up
+                if key == 'seek_index' or isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                counter[key] += value
+
+        return {name: dict(counter) for name, counter in counters.items()}
+
+    def chrome_trace(self):
+        """The events in the Chrome trace event format (open it in `chrome://tracing` or Perfetto)."""
+        pid = os.getpid()
+        trace_events = [
+            {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': (start - self.origin) * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': pid,
+                'tid': tid,
+                'args': args,
+            }
+            for name, category, start, end, tid, args in self.events
+        ]
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path: str):
+        with open(path, mode='w') as stream:
+            json.dump(self.chrome_trace(), stream)
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+
+
+hook = Instrumentation()
+
+
+def set_hook(new_hook: Instrumentation):
+    """Install an instrumentation hook for the whole process. Returns the previous hook. Pass `Instrumentation()` to disable it again."""
+    global hook
+    previous = hook
+    hook = new_hook
+    return previous
@@ -0,0 +1,107 @@
+import bisect
+
+from constants import DISPOSAL_RESTORE_TO_BACKGROUND, DISPOSAL_RESTORE_TO_PREVIOUS
+
+# 64 MiB
+DEFAULT_BUDGET = 64 * 1024 * 1024
+DEFAULT_INTERVAL = 16
+
+
+def covers(image, width: int, height: int):
+    """Whether an image covers the whole Logical Screen."""
+    return image.x <= 0 and image.y <= 0 and image.x + image.width >= width and image.y + image.height >= height
+
+
+def find_keyframes(images: list, width: int, height: int):
+    """Find the frames whose composited canvas does not depend on the frames before them.
+
+    Frame 0 is one, and so is a frame which:
+
+    - covers the whole screen without a transparent color, unless it is restored to previous (its disposal would bring the older canvas back), or
+    - follows a frame which covers the whole screen and is restored to background, so it is drawn on an empty canvas.
+
+    Only the Image Descriptors and the Graphic Control Extensions are used, so the keyframes are known right after indexing. A broken image is not drawn, the canvas after it can differ from the one replayed from a keyframe.
+
+    Returns:
+        The sorted frame indices of the keyframes.
+    """
+    keyframes = []
+    cleared = True
+    for i, image in enumerate(images):
+        gce = image.gce
+        disposal_method = gce.disposal_method if gce is not None else 0
+        opaque = gce is None or not gce.transparent_color_flag
+
+        if cleared or (opaque and covers(image, width, height) and disposal_method != DISPOSAL_RESTORE_TO_PREVIOUS):
+            keyframes.append(i)
+
+        cleared = disposal_method == DISPOSAL_RESTORE_TO_BACKGROUND and covers(image, width, height)
+
+    return keyframes
+
+
+class SnapshotStore:
+    """Periodic snapshots of the compositor of one `GIF` within a memory budget in bytes.
+
+    A snapshot is taken after every `interval`-th frame. When the budget is exceeded the interval is doubled and the snapshots which are off the new interval are dropped, so the snapshots stay evenly spread over the animation.
+
+    Attributes:
+        budget: The maximum number of bytes of all snapshots.
+        interval: The number of frames between two snapshots.
+        size: The number of bytes of all snapshots.
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET, interval=DEFAULT_INTERVAL):
+        self.budget = budget
+        self.interval = interval
+        self.size = 0
+        # frame index -> (compositor snapshot, whether the frame has been drawn)
+        self.snapshots = {}
+        self._indices = []
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    @staticmethod
+    def _nbytes(snapshot):
+        canvas, pending = snapshot
+        saved = pending[2] if pending is not None else None
+        return canvas.nbytes + (saved.nbytes if saved is not None else 0)
+
+    def wants(self, i: int):
+        """Whether a snapshot should be taken after frame `i`."""
+        return i % self.interval == 0 and i not in self.snapshots
+
+    def put(self, i: int, snapshot, drawn: bool):
+        """Store the snapshot taken after frame `i` (see `Compositor.snapshot`)."""
+        nbytes = self._nbytes(snapshot)
+        if nbytes > self.budget:
+            return
+
+        # the snapshot after frame 0 is on every interval
+        while self.size + nbytes > self.budget and len(self._indices) > 0 and self._indices[-1] > 0:
+            self.interval *= 2
+            for index in [index for index in self._indices if index % self.interval != 0]:
+                self.size -= self._nbytes(self.snapshots.pop(index)[0])
+            self._indices = sorted(self.snapshots)
+
+        if self.size + nbytes > self.budget or i % self.interval != 0:
+            return
+
+        self.snapshots[i] = (snapshot, drawn)
+        bisect.insort(self._indices, i)
+        self.size += nbytes
+
+    def before(self, i: int):
+        """The index of the last snapshot taken at or before frame `i`, `None` if there is none."""
+        position = bisect.bisect_right(self._indices, i)
+        return self._indices[position - 1] if position > 0 else None
+
+    def get(self, i: int):
+        """The `(snapshot, drawn)` stored after frame `i`."""
+        return self.snapshots[i]
+
+    def clear(self):
+        self.snapshots.clear()
+        self._indices.clear()
+        self.size = 0
@@ -0,0 +1,244 @@
+import random
+import collections
+import concurrent.futures
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from decoder import GIF
+from thumbnail import resize
+
+
+def decode_frames(path: str, frames_for, stride=1, size=None, alpha=True):
+    """Composite every `stride`-th frame of a GIF file into an array.
+
+    Args:
+        path: The GIF file.
+        frames_for: A function `frames_for(shape)` which returns the `uint8` array of `shape` to fill, `(frames, height, width, C)`.
+        stride: Take one frame out of `stride`.
+        size: The `(width, height)` of the frames, the Logical Screen size by default.
+        alpha: Keep the alpha channel (`C = 4`), otherwise RGB (`C = 3`).
+
+    Returns:
+        A tuple of the filled array (`None` if the file cannot be read), the number of frames written at its start (broken images are skipped) and the reason the file is broken, if any.
+    """
+    try:
+        with open(path, mode='rb') as stream:
+            gif = GIF(stream, lazy=True)
+            width, height = size if size is not None else (gif.width, gif.height)
+            indices = range(0, len(gif.images), stride)
+            frames = frames_for((len(indices), height, width, 4 if alpha else 3))
+
+            count = 0
+            for i in indices:
+                canvas = gif.seek(i)
+                if canvas is None:
+                    continue
+                if (width, height) != (gif.width, gif.height):
+                    canvas = resize(canvas, width, height)
+                frames[count] = canvas[..., :frames.shape[3]]
+                count += 1
+    except OSError as ex:
+        return None, 0, f'{type(ex).__name__}: {ex}'
+
+    return frames, count, gif.broken_reason
+
+
+def decode_to_shared_memory(path: str, stride=1, size=None, alpha=True):
+    """Run `decode_frames` in a worker process, straight into a new shared memory block.
+
+    Returns:
+        A tuple of the name of the block (`None` if there is no frame), the shape of the frames written and the broken reason. The caller unlinks the block.
+    """
+    block = None
+
+    def frames_for(shape):
+        nonlocal block
+        block = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape))))
+        return np.ndarray(shape, dtype=np.uint8, buffer=block.buf)
+
+    frames, count, broken_reason = decode_frames(path, frames_for, stride, size, alpha)
+    if frames is None:
+        return None, None, broken_reason
+
+    shape = (count, *frames.shape[1:])
+    # the array must be dropped before the block is closed
+    del frames
+    block.close()
+    if count == 0:
+        block.unlink()
+        return None, shape, broken_reason
+
+    return block.name, shape, broken_reason
+
+
+class _Segment:
+    """The decoded frames of one file, in shared memory or in a local array, until all of them are batched."""
+
+    __slots__ = ('block', 'frames', 'remaining')
+
+    def __init__(self, frames, block=None):
+        self.block = block
+        self.frames = frames
+        self.remaining = len(frames)
+
+    def release(self):
+        self.frames = None
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+
+
+class FrameLoader:
+    """Iterate through the frames of many GIF files in fixed-size batches.
+
+    Worker processes decode whole files in the background, through `GIF`, into shared memory blocks; only the name and the shape of a block are pickled. The main process copies the frames of the decoded files into contiguous `(batch_size, height, width, C)` batches and never decodes anything itself, so it only waits when the workers fall behind. At most `prefetch` files are decoded ahead.
+
+    Args:
+        paths: The GIF files.
+        batch_size: The number of frames in a batch.
+        size: The `(width, height)` of the frames. Without it, all the files must have the same Logical Screen size.
+        stride: Take one frame out of `stride` of every file.
+        shuffle: Shuffle the order of the files and the frames across files. The frames are drawn at random from a buffer of at least `buffer` decoded frames.
+        buffer: The size of the shuffle buffer in frames, `4 * batch_size` by default.
+        seed: The seed of the shuffling.
+        drop_last: Drop the last batch if it is not full.
+        alpha: Keep the alpha channel (`C = 4`), otherwise RGB (`C = 3`).
+        jobs: The number of worker processes. With 1, the files are decoded in the main process.
+        prefetch: The number of files decoded ahead, `2 * jobs` by default.
+
+    Attributes:
+        broken: The `(path, broken_reason)` of every broken file seen by the last iteration. Their frames decoded before the error are used.
+    """
+
+    def __init__(self, paths: list, batch_size: int, size=None, stride=1, shuffle=False, buffer=None, seed=None, drop_last=False, alpha=True, jobs=2, prefetch=None):
+        if batch_size < 1:
+            raise ValueError(f'The batch size must be positive, got {batch_size}!')
+        if stride < 1:
+            raise ValueError(f'The stride must be positive, got {stride}!')
+
+        self.paths = list(paths)
+        self.batch_size = batch_size
+        self.size = tuple(size) if size is not None else None
+        self.stride = stride
+        self.shuffle = shuffle
+        self.buffer = buffer if buffer is not None else 4 * batch_size
+        self.seed = seed
+        self.drop_last = drop_last
+        self.alpha = alpha
+        self.jobs = jobs
+        self.prefetch = prefetch if prefetch is not None else 2 * jobs
+        self.broken = []
+
+    def _segments(self, paths: list):
+        """Iterate through the decoded files in the order of `paths`."""
+        if self.jobs <= 1:
+            for path in paths:
+                frames, count, broken_reason = decode_frames(path, lambda shape: np.empty(shape, dtype=np.uint8), self.stride, self.size, self.alpha)
+                yield path, broken_reason, _Segment(frames[:count]) if count > 0 else None
+            return
+
+        # the workers must share the resource tracker of this process, their own trackers would unlink the blocks they created when they exit
+        resource_tracker.ensure_running()
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs)
+        pending = collections.deque()
+        try:
+            paths = iter(paths)
+            while True:
+                while len(pending) < self.prefetch:
+                    path = next(paths, None)
+                    if path is None:
+                        break
+                    pending.append((path, executor.submit(decode_to_shared_memory, path, self.stride, self.size, self.alpha)))
+
+                if len(pending) == 0:
+                    return
+
+                path, future = pending.popleft()
+                name, shape, broken_reason = future.result()
+                if name is None:
+                    yield path, broken_reason, None
+                    continue
+
+                block = shared_memory.SharedMemory(name=name)
+                yield path, broken_reason, _Segment(np.ndarray(shape, dtype=np.uint8, buffer=block.buf), block)
+        finally:
+            # stopped early: unlink the blocks of the files decoded ahead
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            for _, future in pending:
+                if not future.cancelled() and future.exception() is None:
+                    name, _, _ = future.result()
+                    if name is not None:
+                        block = shared_memory.SharedMemory(name=name)
+                        block.close()
+                        block.unlink()
+
+    def __iter__(self):
+        """Yield the batches as `(batch_size, height, width, C)` `uint8` arrays, the last one may be smaller (see `drop_last`)."""
+        rng = random.Random(self.seed)
+        paths = list(self.paths)
+        if self.shuffle:
+            rng.shuffle(paths)
+
+        self.broken = []
+        # the (segment, frame index) of the frames decoded but not batched yet
+        frames = collections.deque() if not self.shuffle else []
+        segments = []
+        frame_shape = None
+        exhausted = False
+
+        def take():
+            if self.shuffle:
+                # swap the drawn frame with the last one so that removing it is cheap
+                k = rng.randrange(len(frames))
+                frames[k], frames[-1] = frames[-1], frames[k]
+                return frames.pop()
+            return frames.popleft()
+
+        decoded = self._segments(paths)
+        try:
+            while True:
+                wanted = self.buffer if self.shuffle else self.batch_size
+                while not exhausted and len(frames) < wanted:
+                    item = next(decoded, None)
+                    if item is None:
+                        exhausted = True
+                        break
+
+                    path, broken_reason, segment = item
+                    if broken_reason is not None:
+                        self.broken.append((path, broken_reason))
+                    if segment is None:
+                        continue
+
+                    if frame_shape is None:
+                        frame_shape = segment.frames.shape[1:]
+                    elif segment.frames.shape[1:] != frame_shape:
+                        shape = segment.frames.shape[1:]
+                        segment.release()
+                        raise ValueError(f'The frames of {path} are {shape}, expected {frame_shape}, pass a size to resize them!')
+
+                    segments.append(segment)
+                    frames.extend((segment, j) for j in range(len(segment.frames)))
+
+                count = min(self.batch_size, len(frames))
+                if count == 0 or (count < self.batch_size and self.drop_last):
+                    return
+
+                batch = np.empty((count, *frame_shape), dtype=np.uint8)
+                for k in range(count):
+                    segment, j = take()
+                    batch[k] = segment.frames[j]
+                    segment.remaining -= 1
+                    if segment.remaining == 0:
+                        segment.release()
+                        segments.remove(segment)
+
+                yield batch
+        finally:
+            decoded.close()
+            for segment in segments:
+                segment.release()
@@ -0,0 +1,291 @@
+import time
+
+import instrumentation
+from bitreader import BitReader
+
+# GIF codes are at most 12 bits wide, so the code table never holds more than 4096 entries.
+MAX_CODE_SIZE = 12
+MAX_CODES = 1 << MAX_CODE_SIZE
+
+# the maximum number of codes taken from the bit reader at once
+BATCH_SIZE = 64
+
+# The offset and length tables of `decode`, reused across calls as allocating them costs more than decoding a small image. Every call (and thread) takes its own pair.
+_free_tables = []
+
+
+def decode(compressed_data: bytes, lzw_min_code_size: int, pixel_count: int):
+    """Decode a GIF LZW code stream into an index stream.
+
+    Instead of keeping every code as a list of indices, the code table is a pair of fixed 4096-entry arrays holding the offset and the length of the first occurrence of the code's string in the index stream. Every code string is `{CODE-1}+K` and `{CODE-1}` is always immediately followed by `K` in the output, so the string of a new code is exactly the slice of the index stream starting where `{CODE-1}` was written. Outputting a code is then a single slice copy inside the preallocated buffer.
+
+    Args:
+        compressed_data: The concatenated image data sub-blocks.
+        lzw_min_code_size: The LZW Minimum Code Size of the image.
+        pixel_count: The number of indices expected (`width * height`).
+
+    Returns:
+        A tuple of the index stream (`bytearray`) and the broken reason (`None` if the whole image has been decoded).
+    """
+    hook = instrumentation.hook
+    start = time.perf_counter() if hook.enabled else 0.0
+
+    clear_code = 1 << lzw_min_code_size
+    eoi_code = clear_code + 1
+
+    # the tables do not need to be cleared, an entry is always written before it is read
+    tables = _free_tables.pop() if len(_free_tables) > 0 else ([0] * MAX_CODES, [0] * MAX_CODES)
+    offsets, lengths = tables
+
+    index_stream = bytearray(pixel_count)
+    pos = 0
+
+    bit_reader = BitReader(compressed_data, lzw_min_code_size + 1)
+    init_num_bits = bit_reader.num_bits
+    next_code = eoi_code + 1
+    code_limit = 1 << init_num_bits
+
+    # position and length of {CODE-1} in the index stream, -1 right after a clear code
+    previous_offset = -1
+    previous_length = 0
+
+    broken_reason = None
+    done = False
+    eoi_found = False
+    # the codes read after a clear code with the initial code width, they do not have to be read again
+    pending = None
+
+    # statistics for the instrumentation hook
+    num_codes = 0
+    num_clear_codes = 0
+
+    while not done:
+        if pending is not None:
+            codes = pending
+            pending = None
+        else:
+            # Every code adds at most one entry to the code table, so the code width cannot change before `code_limit - next_code` codes have been read. Only a clear code can interrupt the batch earlier.
+            if next_code < MAX_CODES:
+                # at least one code: with a minimum code size of 1 the table is full before the first code is read
+                batch_size = max(1, min(code_limit - next_code, BATCH_SIZE))
+            else:
+                batch_size = BATCH_SIZE
+
+            batch_position = bit_reader.tell()
+            num_bits = bit_reader.num_bits
+
+            codes = bit_reader.read_codes(batch_size)
+            if len(codes) == 0:
+                # the end of the data
+                break
+            num_codes += len(codes)
+
+        for i, code in enumerate(codes):
+            # the most frequent codes first: color indices and codes from the table (there is none right after a clear code)
+            if code < clear_code:
+                if pos >= pixel_count:
+                    broken_reason = f'Too much image data! The image only has {pixel_count} pixels.'
+                    done = True
+                    break
+
+                index_stream[pos] = code
+                length = 1
+            elif eoi_code < code < next_code:
+                # output {CODE} to index stream
+                offset = offsets[code]
+                length = lengths[code]
+                if pos + length > pixel_count:
+                    broken_reason = f'Too much image data! The image only has {pixel_count} pixels.'
+                    done = True
+                    break
+
+                index_stream[pos:pos + length] = index_stream[offset:offset + length]
+            elif code == clear_code:
+                num_clear_codes += 1
+                if num_bits == init_num_bits:
+                    # the codes after the clear code have been read with the initial code width already
+                    pending = codes[i + 1:] or None
+                else:
+                    # rewind the codes after the clear code as they have to be read with the initial code width
+                    bit_reader.seek(batch_position + (i + 1) * num_bits)
+                    num_codes -= len(codes) - i - 1
+
+                # re-initialize code table
+                bit_reader.reset()
+                next_code = eoi_code + 1
+                code_limit = 1 << init_num_bits
+                previous_offset = -1
+                break
+            elif code == eoi_code:
+                num_codes -= len(codes) - i - 1
+                eoi_found = True
+                done = True
+                break
+            elif previous_offset < 0:
+                broken_reason = f'The first code after a clear code is out of range ({code} vs {clear_code})!'
+                done = True
+                break
+            elif code == next_code:
+                # CODE is not in the code table yet, output {CODE-1}+K where K is the first index of {CODE-1}
+                length = previous_length + 1
+                if pos + length > pixel_count:
+                    broken_reason = f'Too much image data! The image only has {pixel_count} pixels.'
+                    done = True
+                    break
+
+                index_stream[pos:pos + previous_length] = index_stream[previous_offset:previous_offset + previous_length]
+                index_stream[pos + previous_length] = index_stream[previous_offset]
+            else:
+                broken_reason = f'The code ({code}) is out of range of the code table ({next_code})!'
+                done = True
+                break
+
+            if previous_offset >= 0 and next_code < MAX_CODES:
+                # add {CODE-1}+K to code table
+                offsets[next_code] = previous_offset
+                lengths[next_code] = previous_length + 1
+                next_code += 1
+
+            # With a minimum code size of 1 the table is already full after the first code, so this is checked after every code and not only when an entry is added.
+            if next_code >= code_limit and bit_reader.num_bits < MAX_CODE_SIZE:
+                # this can only happen on the last code of the batch
+                bit_reader.num_bits += 1
+                code_limit <<= 1
+
+            previous_offset = pos
+            previous_length = length
+            pos += length
+        else:
+            # there is no End of Information code, keep what has been decoded
+            if bit_reader.ended:
+                done = True
+
+    _free_tables.append(tables)
+
+    if broken_reason is None and pos != pixel_count:
+        broken_reason = f'Not enough image data! {pos}/{pixel_count}'
+
+    if pos != pixel_count:
+        del index_stream[pos:]
+
+    if hook.enabled:
+        hook.event(
+            'lzw',
+            'decode',
+            start,
+            time.perf_counter(),
+            compressed_size=len(compressed_data),
+            pixels=pixel_count,
+            codes=num_codes,
+            clear_codes=num_clear_codes,
+            eoi_found=eoi_found,
+            broken=broken_reason is not None,
+        )
+
+    return index_stream, broken_reason
+
+
+def encode(index_stream: bytes, lzw_min_code_size: int, clear_interval=None):
+    """Encode an index stream into a GIF LZW code stream, the inverse of `decode`.
+
+    The code table is a `dict` keyed by `(prefix code << 8) | index`, so every index costs one hash lookup and the whole stream is encoded in linear time. The table is reset with a clear code when it is full.
+
+    Args:
+        index_stream: The color indices (`bytes`, `bytearray` or a sequence of `int`), all below `1 << lzw_min_code_size`.
+        lzw_min_code_size: The LZW Minimum Code Size of the image (1 to 8).
+        clear_interval: Also emit a clear code after this many codes. By default only when the code table is full.
+
+    Returns:
+        The code stream (`bytes`), to be split into data sub-blocks.
+    """
+    hook = instrumentation.hook
+    start = time.perf_counter() if hook.enabled else 0.0
+
+    clear_code = 1 << lzw_min_code_size
+    eoi_code = clear_code + 1
+
+    data = bytearray()
+    num_bits = lzw_min_code_size + 1
+
+    table = {}
+    next_code = eoi_code + 1
+    codes_since_clear = 0
+
+    # statistics for the instrumentation hook
+    num_codes = 0
+    num_clear_codes = 1
+
+    # 1. Start with a clear code, the bits are accumulated in `buffer` and flushed byte by byte
+    buffer = clear_code
+    buffer_bits = num_bits
+
+    prefix = -1
+    for k in index_stream:
+        if prefix < 0:
+            prefix = k
+            continue
+
+        key = (prefix << 8) | k
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+
+        # 2. Output the code of the longest known string
+        buffer |= prefix << buffer_bits
+        buffer_bits += num_bits
+        while buffer_bits >= 8:
+            data.append(buffer & 0xff)
+            buffer >>= 8
+            buffer_bits -= 8
+        num_codes += 1
+        codes_since_clear += 1
+
+        if next_code < MAX_CODES:
+            table[key] = next_code
+            next_code += 1
+            # the decoder adds its entries one code later, it widens the codes when its table reaches the limit
+            if next_code - 1 == (1 << num_bits) and num_bits < MAX_CODE_SIZE:
+                num_bits += 1
+
+        if next_code == MAX_CODES or (clear_interval is not None and codes_since_clear >= clear_interval):
+            # 3. Re-initialize the code table
+            buffer |= clear_code << buffer_bits
+            buffer_bits += num_bits
+            num_clear_codes += 1
+            table.clear()
+            next_code = eoi_code + 1
+            num_bits = lzw_min_code_size + 1
+            codes_since_clear = 0
+
+        prefix = k
+
+    if prefix >= 0:
+        buffer |= prefix << buffer_bits
+        buffer_bits += num_bits
+        num_codes += 1
+
+        # the decoder still adds an entry for the last code before reading the End of Information code
+        if next_code < MAX_CODES:
+            next_code += 1
+            if next_code - 1 == (1 << num_bits) and num_bits < MAX_CODE_SIZE:
+                num_bits += 1
+
+    # 4. End with the End of Information code
+    buffer |= eoi_code << buffer_bits
+    buffer_bits += num_bits
+    data += buffer.to_bytes((buffer_bits + 7) // 8, 'little')
+
+    if hook.enabled:
+        hook.event(
+            'lzw_encode',
+            'encode',
+            start,
+            time.perf_counter(),
+            compressed_size=len(data),
+            pixels=len(index_stream),
+            codes=num_codes,
+            clear_codes=num_clear_codes,
+        )
+
+    return bytes(data)
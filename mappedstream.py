@@ -0,0 +1,77 @@
+import io
+import os
+import mmap
+
+
+class MappedStream:
+    """A read-only stream over a memory-mapped file or any other buffer.
+
+    It implements the subset of `io.BufferedReader` used by the block parsers. `read` returns `memoryview` slices of the mapping, so parsing does not copy any data and `seek` is only an integer assignment.
+
+    Args:
+        data: Any object supporting the buffer protocol (`mmap.mmap`, `bytes`, ...).
+        base: The position of `data` in the whole data stream. Positions passed to `seek` and returned by `tell` are relative to the whole data stream, so a block parser can be run over a window which only holds that block.
+    """
+
+    def __init__(self, data, base=0):
+        self.data = data
+        self.view = memoryview(data)
+        self.base = base
+        self.size = base + len(self.view)
+        self.position = base
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset: int, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f'Invalid whence ({whence})!')
+
+        if position < self.base:
+            raise ValueError(f'Seek position {position} is before the start of the data ({self.base})!')
+
+        self.position = position
+        return self.position
+
+    def read(self, length=-1):
+        start = min(self.position, self.size)
+        if length is None or length < 0:
+            end = self.size
+        else:
+            end = min(start + length, self.size)
+
+        self.position = end
+        return self.view[start - self.base:end - self.base]
+
+    def close(self):
+        # The mapping stays alive as long as there are views on it (e.g. the sub-blocks of comment blocks), so it is left to the garbage collector.
+        self.view.release()
+
+
+def wrap(stream):
+    """Memory-map the file behind `stream` if possible. Otherwise (pipes, sockets, in-memory buffers, empty files) the stream itself is returned."""
+    if isinstance(stream, MappedStream):
+        return stream
+
+    try:
+        fileno = stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return stream
+
+    try:
+        if os.fstat(fileno).st_size == 0:
+            return stream
+        data = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return stream
+
+    return MappedStream(data)
@@ -0,0 +1,343 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from constants import *
+from decoder import GIF
+from mappedstream import MappedStream
+from probe import gif_loop_count
+from writer import Frame, color_table, encode_gif
+
+# the rectangle `(left, top, right, bottom)` of a frame which draws nothing
+EMPTY_RECT = (0, 0, 0, 0)
+
+
+def bounding_box(mask: np.ndarray):
+    """The rectangle `(left, top, right, bottom)` of the `True` pixels of a mask, `EMPTY_RECT` if there is none."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if len(rows) == 0:
+        return EMPTY_RECT
+    columns = np.flatnonzero(mask.any(axis=0))
+    return int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1
+
+
+def union(rect, other):
+    if rect == EMPTY_RECT:
+        return other
+    if other == EMPTY_RECT:
+        return rect
+    return min(rect[0], other[0]), min(rect[1], other[1]), max(rect[2], other[2]), max(rect[3], other[3])
+
+
+def area(rect):
+    return (rect[2] - rect[0]) * (rect[3] - rect[1])
+
+
+def changed_pixels(canvas: np.ndarray, shown: np.ndarray):
+    """The pixels a frame has to draw to turn the `shown` canvas into `canvas`. Frames cannot draw transparent pixels, those are cleared by disposal."""
+    return (canvas[..., 3] != 0) & (canvas != shown).any(axis=2)
+
+
+def pack_colors(pixels: np.ndarray):
+    """Pack RGB(A) pixels into one `uint32` per pixel for sorting and lookups."""
+    pixels = pixels.astype(np.uint32)
+    return (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+
+
+class Optimizer:
+    """Rewrite the frames of an animation as the differences between the composited canvases.
+
+    Every frame is cropped to the bounding box of the pixels it changes and the unchanged pixels inside the box become transparent, which gives LZW long runs of one index. The disposal method of each frame is chosen by looking at the next canvas: restore to background is used when pixels have to become transparent again, or when it gives the next frame a smaller box. Frames which show the same canvas as the previous frame are merged into it by adding up the delays.
+
+    Args:
+        gif: A `GIF` which is not broken.
+
+    Attributes:
+        frames: The optimized `Frame` objects, filled by `run`.
+        broken_reason: Why the animation cannot be optimized, `None` if it can.
+    """
+
+    def __init__(self, gif: GIF):
+        self.gif = gif
+        self.frames = []
+        self.broken_reason = None
+        # the canvas displayed after the last optimized frame
+        self._shown = None
+
+        self.global_palette = gif.global_palette
+        self._global_colors = None
+        self._global_size = 0
+        if self.global_palette is not None and len(self.global_palette) > 0:
+            # the padded size of the table as written, the padding entries are free for the transparent color
+            _, size = color_table(self.global_palette)
+            self._global_size = 2 ** (size + 1)
+            packed = pack_colors(self.global_palette.colors)
+            # the first index of every color
+            self._global_colors, first = np.unique(packed, return_index=True)
+            self._global_indices = first.astype(np.uint8)
+
+    def _map_colors(self, colors: np.ndarray, need_transparent: bool):
+        """Find the color table for the packed colors of a frame.
+
+        Returns:
+            A tuple of the palette (`None` for the Global Color Table), the index of every color and the transparent color index (`None` if not needed). `None` if the colors do not fit in a color table.
+        """
+        if self._global_colors is not None:
+            positions = np.minimum(np.searchsorted(self._global_colors, colors), len(self._global_colors) - 1)
+            if (self._global_colors[positions] == colors).all():
+                indices = self._global_indices[positions]
+                if not need_transparent:
+                    return None, indices, None
+
+                # any index the frame does not draw with can be the transparent color
+                unused = np.setdiff1d(np.arange(self._global_size), indices)
+                if len(unused) > 0:
+                    return None, indices, int(unused[0])
+
+        if len(colors) + need_transparent > 256:
+            return None
+
+        palette = np.zeros((len(colors) + need_transparent, 3), dtype=np.uint8)
+        palette[:len(colors), 0] = colors >> 16
+        palette[:len(colors), 1] = colors >> 8
+        palette[:len(colors), 2] = colors
+        transparent_color = len(colors) if need_transparent else None
+        return palette.tobytes(), np.arange(len(colors), dtype=np.uint8), transparent_color
+
+    def _make_frame(self, canvas: np.ndarray, drawn: np.ndarray, rect, delay_time: int, disposal_method: int):
+        if rect == EMPTY_RECT:
+            # a frame needs at least one pixel
+            rect = (0, 0, 1, 1)
+
+        left, top, right, bottom = rect
+        box = canvas[top:bottom, left:right]
+        box_drawn = drawn[top:bottom, left:right]
+
+        # Some decoders restore to the background color instead of clearing the frame when it has no transparent color.
+        restores = disposal_method == DISPOSAL_RESTORE_TO_BACKGROUND
+
+        colors, inverse = np.unique(pack_colors(box[box_drawn]), return_inverse=True)
+        mapping = self._map_colors(colors, restores or not box_drawn.all())
+        if mapping is None:
+            # there is no color index left for the transparent color, draw the unchanged opaque pixels again
+            box_drawn = box[..., 3] != 0
+            colors, inverse = np.unique(pack_colors(box[box_drawn]), return_inverse=True)
+            mapping = self._map_colors(colors, restores or not box_drawn.all())
+            if mapping is None:
+                self.broken_reason = f'Frame {len(self.frames)} needs more than 256 colors!'
+                return None
+
+        palette, indices, transparent_color = mapping
+        index_stream = np.full(box_drawn.shape, transparent_color or 0, dtype=np.uint8)
+        index_stream[box_drawn] = indices[inverse.reshape(-1)]
+
+        return Frame(
+            index_stream,
+            right - left,
+            bottom - top,
+            left,
+            top,
+            palette=palette,
+            delay_time=delay_time,
+            disposal_method=disposal_method,
+            transparent_color=transparent_color,
+        )
+
+    def _choose_disposal(self, canvas: np.ndarray, rect, next_canvas: np.ndarray):
+        """Choose the disposal method of a frame from the canvas after the next frame.
+
+        Returns:
+            A tuple of the disposal method, the (possibly enlarged) rectangle of the frame and the pixels the next frame draws.
+        """
+        # pixels which become transparent again can only be cleared by restoring to background
+        revealed = (next_canvas[..., 3] == 0) & (canvas[..., 3] != 0)
+        cleared_rect = union(rect, bounding_box(revealed))
+
+        cleared = canvas.copy()
+        left, top, right, bottom = cleared_rect
+        cleared[top:bottom, left:right] = 0
+        cleared_drawn = changed_pixels(next_canvas, cleared)
+
+        if not revealed.any():
+            kept_drawn = changed_pixels(next_canvas, canvas)
+            if area(bounding_box(kept_drawn)) <= area(bounding_box(cleared_drawn)):
+                return DISPOSAL_DO_NOT_DISPOSE, rect, kept_drawn
+
+        return DISPOSAL_RESTORE_TO_BACKGROUND, cleared_rect, cleared_drawn
+
+    def _emit(self, canvas: np.ndarray, drawn: np.ndarray, rect, delay_time: int, disposal_method: int):
+        """Append a frame, or merge it into the previous frame if it shows the same canvas. Returns `False` if the frame cannot be made."""
+        if rect == EMPTY_RECT and len(self.frames) > 0 and np.array_equal(canvas, self._shown):
+            # show the previous frame longer instead
+            self.frames[-1].delay_time += delay_time
+            return True
+
+        # a frame which draws nothing still shows the disposed canvas of the previous frame, `_make_frame` turns it into one transparent pixel
+        frame = self._make_frame(canvas, drawn, rect, delay_time, disposal_method)
+        if frame is None:
+            return False
+
+        self.frames.append(frame)
+        self._shown = canvas
+        return True
+
+    def run(self):
+        """Compute the optimized frames. Returns whether it succeeded, otherwise see `broken_reason`."""
+        gif = self.gif
+        delays = [image.gce.delay_time if image.gce is not None else 0 for image in gif.images]
+
+        # the frame waiting for the next canvas to choose its disposal: (canvas, pixels drawn, rectangle, delay)
+        pending = None
+
+        for i, canvas in enumerate(gif.composite()):
+            canvas = canvas.copy()
+
+            if pending is None:
+                drawn = canvas[..., 3] != 0
+                # the first frame covers the whole screen, decoders disagree on what shows outside of it
+                rect = (0, 0, gif.width, gif.height)
+            else:
+                pending_canvas, pending_drawn, pending_rect, pending_delay = pending
+                disposal_method, pending_rect, drawn = self._choose_disposal(pending_canvas, pending_rect, canvas)
+                if not self._emit(pending_canvas, pending_drawn, pending_rect, pending_delay, disposal_method):
+                    return False
+                rect = bounding_box(drawn)
+
+            pending = (canvas, drawn, rect, delays[i])
+
+        if pending is not None:
+            if not self._emit(*pending, DISPOSAL_DO_NOT_DISPOSE):
+                return False
+
+        return True
+
+
+def optimize(data: bytes, jobs=1):
+    """Optimize GIF data (see `Optimizer`).
+
+    Returns:
+        A tuple of the optimized GIF data and the reason why it could not be optimized. The original data is returned when the file is broken, cannot be optimized or would not get smaller.
+    """
+    gif = GIF(MappedStream(data))
+    if gif.broken:
+        return data, gif.broken_reason
+
+    optimizer = Optimizer(gif)
+    if not optimizer.run():
+        return data, optimizer.broken_reason
+
+    loops = gif_loop_count(gif)
+    optimized = encode_gif(
+        gif.width,
+        gif.height,
+        optimizer.frames,
+        gif.global_palette if gif.global_palette is not None and len(gif.global_palette) > 0 else None,
+        loop_count=loops,
+        background=gif.background,
+        jobs=jobs,
+    )
+    if len(optimized) >= len(data):
+        return data, 'The optimized file is not smaller'
+
+    return optimized, None
+
+
+def decode_time(data: bytes, repeat=3):
+    """The best time to parse and decode every image of GIF data, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        GIF(MappedStream(data))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def optimize_file(in_file: str, out_file: str, jobs=1, repeat=3):
+    """Optimize a GIF file into `out_file` and measure what it saves.
+
+    Returns:
+        A JSON serializable `dict` with the sizes in bytes, the decode times in seconds and what has been saved.
+    """
+    with open(in_file, mode='rb') as stream:
+        data = stream.read()
+
+    optimized, reason = optimize(data, jobs)
+    with open(out_file, mode='wb') as stream:
+        stream.write(optimized)
+
+    before = decode_time(data, repeat)
+    after = decode_time(optimized, repeat) if optimized is not data else before
+    return {
+        'path': in_file,
+        'output': out_file,
+        'optimized': reason is None,
+        'reason': reason,
+        'size_before': len(data),
+        'size_after': len(optimized),
+        'size_saved': len(data) - len(optimized),
+        'decode_time_before': before,
+        'decode_time_after': after,
+        'decode_time_saved': before - after,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Shrink GIF animations by storing only the changed part of every frame',
+    )
+
+    parser.add_argument(
+        'in_files',
+        type=str,
+        nargs='+',
+        help='the paths of GIF files',
+    )
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        default=None,
+        help='write the optimized files into this directory (next to the input files with a .optimized.gif suffix by default)',
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help='the number of processes encoding the frames of a file',
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='the number of decoding runs to time, the best one is kept',
+    )
+
+    args = parser.parse_args()
+
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    status = 0
+    for in_file in args.in_files:
+        if not os.path.isfile(in_file):
+            print(f'{in_file} is not a file!', file=sys.stderr)
+            status = 1
+            continue
+
+        root, _ = os.path.splitext(in_file)
+        if args.output_dir is None:
+            out_file = f'{root}.optimized.gif'
+        else:
+            out_file = os.path.join(args.output_dir, os.path.basename(in_file))
+
+        result = optimize_file(in_file, out_file, args.jobs, args.repeat)
+        print(json.dumps(result))
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
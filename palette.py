@@ -0,0 +1,62 @@
+import numpy as np
+
+import render
+
+
+class Palette:
+    """A color table parsed once into a compact `(num_colors, 3)` `uint8` array, with its lookup tables built on first use.
+
+    Attributes:
+        data: The raw color table data.
+        colors: The read-only `(num_colors, 3)` array of the colors.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = bytes(data)
+        self.colors = np.frombuffer(self.data, dtype=np.uint8, count=len(self.data) // 3 * 3).reshape(-1, 3)
+        # (transparent color, alpha) -> lookup table
+        self._luts = {}
+
+    def __len__(self):
+        return len(self.colors)
+
+    def lut(self, transparent_color=None, alpha=True):
+        """The read-only lookup table of `render.palette_lut`, built once for every transparent color."""
+        key = (transparent_color, alpha)
+        lut = self._luts.get(key)
+        if lut is None:
+            lut = render.palette_lut(self.data, transparent_color, alpha)
+            lut.flags.writeable = False
+            self._luts[key] = lut
+
+        return lut
+
+    def tolist(self):
+        """The colors as a list of `[r, g, b]` lists."""
+        return self.colors.tolist()
+
+
+class PaletteCache:
+    """Share one `Palette` between all color tables with the same content.
+
+    Many animations repeat the same Local Color Table on every frame. Looking the data up here costs one hash of at most 768 bytes, and the colors and lookup tables are only built once.
+    """
+
+    def __init__(self):
+        self.palettes = {}
+
+    def __len__(self):
+        return len(self.palettes)
+
+    def get(self, data: bytes):
+        key = bytes(data)
+        palette = self.palettes.get(key)
+        if palette is None:
+            palette = Palette(key)
+            self.palettes[key] = palette
+
+        return palette
+
+
+# used when an image has neither a Local nor a Global Color Table
+EMPTY_PALETTE = Palette(b'')
@@ -0,0 +1,307 @@
+import time
+import queue
+import threading
+
+from decoder import GIF
+from probe import gif_loop_count
+
+# playback orders
+FORWARD = 'forward'
+REVERSE = 'reverse'
+PINGPONG = 'pingpong'
+MODES = (FORWARD, REVERSE, PINGPONG)
+
+# Browsers show frames with a delay of 0 or 1 hundredth of a second for 10 hundredths instead.
+MIN_DELAY = 2
+DEFAULT_DELAY = 10
+
+# the number of composited frames decoded ahead of the one on screen
+DEFAULT_AHEAD = 8
+
+# use the loop count of the NETSCAPE2.0 extension of the file
+LOOPS_FROM_FILE = -1
+
+
+class MonotonicClock:
+    """The real clock. Tests pass an object with the same `now` method which returns the time they want."""
+
+    def now(self):
+        return time.monotonic()
+
+
+class PlaybackFrame:
+    """A composited frame ready to be shown.
+
+    Attributes:
+        index: The frame index.
+        canvas: The `(height, width, 4)` RGBA canvas (a private copy).
+        delay: How long the frame stays on screen, in seconds.
+    """
+
+    __slots__ = ('index', 'canvas', 'delay')
+
+    def __init__(self, index: int, canvas, delay: float):
+        self.index = index
+        self.canvas = canvas
+        self.delay = delay
+
+
+def frame_delay(gif: GIF, i: int):
+    """The display time of the `i`-th frame in seconds."""
+    gce = gif.images[i].gce
+    delay_time = gce.delay_time if gce is not None else 0
+    if delay_time < MIN_DELAY:
+        delay_time = DEFAULT_DELAY
+    return delay_time / 100
+
+
+def frame_order(count: int, mode=FORWARD, loops=None, start=None):
+    """Iterate through the frame indices in playback order.
+
+    Args:
+        count: The number of frames.
+        mode: `FORWARD`, `REVERSE` or `PINGPONG` (forward then backward without repeating the end frames).
+        loops: How many times the animation repeats after the first time, 0 repeats forever and `None` plays it once (the NETSCAPE2.0 loop count).
+        start: The first frame, the first frame of the order by default. The rest of the first pass is played from there.
+    """
+    if count == 0:
+        return
+
+    if mode == FORWARD:
+        cycle = list(range(count))
+    elif mode == REVERSE:
+        cycle = list(range(count - 1, -1, -1))
+    elif mode == PINGPONG:
+        cycle = list(range(count)) + list(range(count - 2, 0, -1))
+    else:
+        raise ValueError(f'Unknown playback mode {mode}, expected one of {MODES}!')
+
+    first = cycle.index(start) if start is not None else 0
+    yield from cycle[first:]
+
+    repeats = 0
+    while loops == 0 or (loops is not None and repeats < loops):
+        yield from cycle
+        repeats += 1
+
+
+class Player:
+    """Play a `GIF` in real time, independently of any GUI toolkit.
+
+    A producer composites the frames in playback order into a bounded queue, `ahead` frames in advance, on a background thread (or inside `update` when `threaded` is `False`). The toolkit calls `update` from its own loop and shows the returned frame. Every frame has its own deadline: the deadline of a frame is the deadline of the previous one plus its delay, so the timing does not drift with the latency of the loop. When the player falls behind, the frames which are already due are skipped. When the producer falls behind, the schedule restarts from the late frame instead of skipping the following ones.
+
+    Seeking cancels the frames being decoded for the old position: the producer works on a generation number and frames of an older generation are dropped.
+
+    Args:
+        gif: The `GIF` to play. Only the producer uses it, with `seek`, so a lazy `GIF` with a `SnapshotStore` plays in reverse cheaply.
+        clock: An object with a `now()` method returning seconds on a monotonic clock.
+        ahead: The size of the frame queue.
+        mode: The playback order (see `frame_order`).
+        loops: The loop count, the one of the NETSCAPE2.0 extension of the file by default.
+        threaded: Decode on a background thread. Without it `update` fills the queue itself, which makes the player deterministic.
+
+    Attributes:
+        frame: The `PlaybackFrame` on screen, `None` before the first one.
+        skipped: The number of frames skipped to catch up.
+        finished: Whether the last frame of the playback order has been shown.
+        paused: Whether the playback is paused.
+    """
+
+    def __init__(self, gif: GIF, clock=None, ahead=DEFAULT_AHEAD, mode=FORWARD, loops=LOOPS_FROM_FILE, threaded=True):
+        self.gif = gif
+        self.clock = clock if clock is not None else MonotonicClock()
+        self.ahead = ahead
+        self.mode = mode
+        self.threaded = threaded
+
+        self.loops = gif_loop_count(gif) if loops == LOOPS_FROM_FILE else loops
+
+        self.frame = None
+        self.skipped = 0
+        self.finished = False
+        self.paused = False
+
+        self._queue = queue.Queue(maxsize=ahead)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._start = None
+        self._stopping = False
+        self._thread = None
+
+        # producer state, only used by the producer
+        self._produced_generation = -1
+        self._order = None
+
+        # the next frame taken from the queue and its deadline
+        self._next = None
+        self._deadline = 0.0
+        # time left until the deadline when paused
+        self._remaining = 0.0
+        # show the frame of a seek while paused
+        self._stepping = False
+
+    def _produce(self):
+        """Composite the next frame of the playback order.
+
+        Returns:
+            A tuple of the generation it has been made for and the `PlaybackFrame`, `None` at the end of the playback order.
+        """
+        with self._lock:
+            generation = self._generation
+            start = self._start
+
+        if generation != self._produced_generation:
+            self._produced_generation = generation
+            self._order = frame_order(len(self.gif.images), self.mode, self.loops, start)
+
+        for i in self._order:
+            canvas = self.gif.seek(i)
+            # broken images are not shown
+            if canvas is not None:
+                return generation, PlaybackFrame(i, canvas.copy(), frame_delay(self.gif, i))
+
+        # the end of the playback order
+        return generation, None
+
+    def _run(self):
+        while not self._stopping:
+            generation, frame = self._produce()
+
+            # a full queue blocks the producer, check regularly whether it has been cancelled
+            while not self._stopping:
+                if generation != self._generation:
+                    break
+                try:
+                    self._queue.put((generation, frame), timeout=0.05)
+                    break
+                except queue.Full:
+                    continue
+
+            if frame is None:
+                # nothing left to decode until the next seek
+                while not self._stopping and generation == self._generation:
+                    time.sleep(0.01)
+
+    def _take(self):
+        """The next frame of the current generation from the queue, `None` if it has not been decoded yet or at the end."""
+        if not self.threaded:
+            while not self._queue.full() and not self.finished:
+                generation, frame = self._produce()
+                self._queue.put((generation, frame))
+                if frame is None:
+                    break
+
+        while True:
+            try:
+                generation, frame = self._queue.get_nowait()
+            except queue.Empty:
+                return None
+
+            if generation != self._generation:
+                continue
+            if frame is None:
+                self.finished = True
+            return frame
+
+    def play(self):
+        """Start decoding and schedule the first frame now."""
+        self._deadline = self.clock.now()
+        if self.threaded and self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='gif-player', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the producer thread."""
+        self._stopping = True
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def pause(self):
+        if not self.paused:
+            self.paused = True
+            self._remaining = self._deadline - self.clock.now()
+
+    def resume(self):
+        if self.paused:
+            self.paused = False
+            self._deadline = self.clock.now() + self._remaining
+
+    def seek(self, n: int):
+        """Jump to frame `n`: the frames decoded for the old position are dropped and frame `n` is shown by the next `update` (also when paused)."""
+        if not 0 <= n < len(self.gif.images):
+            raise IndexError(f'Frame {n} is out of range ({len(self.gif.images)} frames)!')
+
+        with self._lock:
+            self._generation += 1
+            self._start = n
+
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+        self._next = None
+        self.finished = False
+        self._deadline = self.clock.now()
+        self._remaining = 0.0
+        self._stepping = self.paused
+
+    def update(self):
+        """Advance the playback to the current time.
+
+        Returns:
+            The `PlaybackFrame` to show now, or `None` if the frame on screen does not change.
+        """
+        if self.finished:
+            return None
+
+        if self.paused:
+            if not self._stepping:
+                return None
+
+            frame = self._next if self._next is not None else self._take()
+            self._next = None
+            if frame is None:
+                return None
+
+            # stay paused on the frame, it gets its whole delay on `resume`
+            self._stepping = False
+            self._remaining = frame.delay
+            self.frame = frame
+            return frame
+
+        now = self.clock.now()
+        shown = None
+        while self._deadline <= now:
+            if self._next is None:
+                self._next = self._take()
+                if self._next is None:
+                    break
+
+            if shown is not None:
+                self.skipped += 1
+            shown = self._next
+            self._next = None
+            self._deadline += shown.delay
+
+        if shown is None:
+            if self._deadline <= now:
+                # the producer is late, show the next frame as soon as it is decoded
+                self._deadline = now
+            return None
+
+        if self._deadline <= now:
+            # the following frame has not been decoded in time, give the shown frame its whole delay
+            self._deadline = now + shown.delay
+
+        self.frame = shown
+        return shown
+
+    def time_until_next(self):
+        """The seconds until the next frame is due (0 if it is late), `None` when paused or finished."""
+        if self.paused or self.finished:
+            return None
+        return max(0.0, self._deadline - self.clock.now())
@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import struct
+import argparse
+
+from decoder import GIF
+from applicationblock import ApplicationExtensionBlock
+
+# application identifiers + authentication codes of the looping extension
+LOOP_EXTENSIONS = (b'NETSCAPE2.0', b'ANIMEXTS1.0')
+
+
+def loop_count(block: ApplicationExtensionBlock):
+    """The loop count of a NETSCAPE2.0 looping extension (0 means forever), `None` for other application extensions."""
+    if block.identifer is None or block.auth_code is None:
+        return None
+
+    if block.identifer + block.auth_code not in LOOP_EXTENSIONS:
+        return None
+
+    for sub_block in block.app_data:
+        # sub-block ID 1 holds the loop count
+        if len(sub_block) == 3 and sub_block[0] == 1:
+            return struct.unpack('<H', sub_block[1:3])[0]
+
+    return None
+
+
+def gif_loop_count(gif: GIF):
+    """The loop count of the first looping extension of a `GIF`, `None` if it has none (it is played once)."""
+    for block in gif.blocks:
+        if isinstance(block, ApplicationExtensionBlock):
+            loops = loop_count(block)
+            if loops is not None:
+                return loops
+
+    return None
+
+
+def probe_stream(stream):
+    """Collect the metadata of a GIF without decoding any image data.
+
+    The image data sub-blocks are skipped by their size bytes, so this runs in time proportional to the number of blocks instead of the number of pixels.
+
+    Returns:
+        A JSON serializable `dict`.
+    """
+    gif = GIF(stream, lazy=True)
+
+    delays = [image.gce.delay_time if image.gce is not None else 0 for image in gif.images]
+
+    loops = gif_loop_count(gif)
+    return {
+        'width': gif.width,
+        'height': gif.height,
+        'frames': len(gif.images),
+        # the delay times are in hundredths of a second
+        'duration': sum(delays) * 10,
+        'loop_count': loops,
+        'global_palette': gif.global_palette_flag,
+        'local_palettes': any(image.local_palette_flag for image in gif.images),
+        'interlaced': any(image.interlace_flag for image in gif.images),
+        'broken': gif.broken,
+        'broken_reason': gif.broken_reason,
+    }
+
+
+def probe(path: str):
+    """Collect the metadata of a GIF file without decoding any image data (see `probe_stream`)."""
+    with open(path, mode='rb') as stream:
+        return probe_stream(stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Print the metadata of GIF files as JSON lines without decoding the images',
+    )
+
+    parser.add_argument(
+        'in_files',
+        type=str,
+        nargs='+',
+        help='the paths of GIF files',
+    )
+
+    args = parser.parse_args()
+
+    status = 0
+    for in_file in args.in_files:
+        if not os.path.isfile(in_file):
+            print(f'{in_file} is not a file!', file=sys.stderr)
+            status = 1
+            continue
+
+        result = probe(in_file)
+        print(json.dumps({'path': in_file, **result}))
+        if result['broken']:
+            status = 1
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+import struct
+
+from constants import *
+from mappedstream import MappedStream
+from palette import PaletteCache
+from applicationblock import ApplicationExtensionBlock
+from commentblock import CommentExtensionBlock
+from graphicblock import GraphicControlExtension
+from imageblock import ImageDescriptorBlock
+from textblock import PlainTextExtensionBlock
+
+# event types returned by `PushParser.feed`
+HEADER_EVENT = 'header'
+BLOCK_EVENT = 'block'
+FRAME_EVENT = 'frame'
+TRAILER_EVENT = 'trailer'
+
+EXTENSION_CLASSES = {
+    GIF_GCE_EXT_LABEL: GraphicControlExtension,
+    GIF_COM_EXT_LABEL: CommentExtensionBlock,
+    GIF_TXT_EXT_LABEL: PlainTextExtensionBlock,
+    GIF_APP_EXT_LABEL: ApplicationExtensionBlock,
+}
+
+
+class PushParser:
+    """Parse a GIF data stream which arrives in pieces (pipes, sockets, partial downloads).
+
+    Data is pushed with `feed`, which returns the events of every block completed by that data:
+
+    - `(HEADER_EVENT, parser)` once the header, the Logical Screen Descriptor and the Global Color Table have arrived. The screen attributes are then available on the parser.
+    - `(BLOCK_EVENT, block)` for every extension block.
+    - `(FRAME_EVENT, image)` for every `ImageDescriptorBlock`, decoded, with its Graphic Control Extension in `image.gce`.
+    - `(TRAILER_EVENT, None)` at the end of the data stream.
+
+    Only the bytes of the incomplete block are kept between calls. Blocks are not stored by the parser.
+
+    Attributes:
+        broken: Whether invalid data has been found. No more events are emitted after that.
+        finished: Whether the trailer has been reached.
+        position: The position in the data stream of the first byte which has not been parsed yet.
+        frame_count: The number of frames emitted so far.
+    """
+
+    def __init__(self):
+        self.broken = False
+        self.broken_reason = None
+        self.finished = False
+
+        self.width = 0
+        self.height = 0
+        self.global_palette_flag = False
+        self.global_palette_size = 0
+        self.global_palette_seek_pos = 0
+        # the parsed Global Color Table (`Palette`) and the deduplicated Local Color Tables
+        self.global_palette = None
+        self.palettes = PaletteCache()
+        self.sorted = False
+        self.background = 0
+        self.frame_count = 0
+
+        self.buffer = bytearray()
+        # position of the first byte of `buffer` in the data stream
+        self.position = 0
+        # resume point of the sub-block walk of the incomplete block
+        self._scan_pos = 0
+        self._header_parsed = False
+        self._gce = None
+
+    def feed(self, data: bytes):
+        if self.broken or self.finished:
+            return []
+
+        self.buffer += data
+
+        events = []
+        start = 0
+        while not (self.broken or self.finished):
+            if self._header_parsed:
+                end = self._parse_block(start, events)
+            else:
+                end = self._parse_header(start, events)
+
+            if end is None:
+                break
+            start = end
+
+        # drop the parsed blocks only once per call so that feeding a whole file at once stays linear
+        del self.buffer[:start]
+        self.position += start
+        self._scan_pos -= start
+        return events
+
+    def _fail(self, reason: str):
+        self.broken = True
+        self.broken_reason = reason
+        return None
+
+    def _parse_header(self, start: int, events: list):
+        buffer = self.buffer
+
+        # signature (6 bytes) + Logical Screen Descriptor (7 bytes)
+        if len(buffer) - start < 13:
+            return None
+
+        if buffer[start:start + 6] != gif89a_sig:
+            return self._fail('Unsupported signature!')
+
+        self.width, self.height, fields, self.background = struct.unpack_from('<HHBB', buffer, start + 6)
+        if self.width * self.height > MAX_SCREEN_PIXELS:
+            return self._fail(f'The Logical Screen ({self.width}x{self.height}) is larger than {MAX_SCREEN_PIXELS} pixels!')
+
+        self.global_palette_flag = bool(fields & 0b10000000)
+        self.sorted = bool(fields & 0b00001000)
+        self.global_palette_size = 3 * (2 ** ((fields & 0b00000111) + 1))
+
+        end = start + 13
+        if self.global_palette_flag:
+            if len(buffer) - end < self.global_palette_size:
+                return None
+
+            self.global_palette_seek_pos = self.position + end
+            self.global_palette = self.palettes.get(buffer[end:end + self.global_palette_size])
+            end += self.global_palette_size
+
+        self._header_parsed = True
+        self._scan_pos = end
+        events.append((HEADER_EVENT, self))
+        return end
+
+    def _skip_sub_blocks(self, pos: int):
+        """Walk through the data sub-blocks from `pos`. Returns the position after the block terminator or `None` if it has not arrived yet."""
+        buffer = self.buffer
+        size = len(buffer)
+
+        while pos < size:
+            block_size = buffer[pos]
+            if block_size == 0:
+                return pos + 1
+
+            # only remember complete sub-blocks so that the walk resumes at a size byte
+            if pos + 1 + block_size > size:
+                break
+            pos += 1 + block_size
+
+        self._scan_pos = pos
+        return None
+
+    def _parse_block(self, start: int, events: list):
+        buffer = self.buffer
+        if start >= len(buffer):
+            return None
+
+        block_type = buffer[start]
+
+        if block_type == GIF_TRAILER:
+            self.finished = True
+            events.append((TRAILER_EVENT, None))
+            return start + 1
+
+        if block_type == GIF_EXTENSION_INTRODUCER:
+            if len(buffer) - start < 2:
+                return None
+
+            block_class = EXTENSION_CLASSES.get(buffer[start + 1])
+            if block_class is None:
+                return self._fail(f'Unknown extension label at {self.position + start}!')
+
+            # every extension is followed by sub-blocks (the fixed size fields count as the first one)
+            end = self._skip_sub_blocks(max(self._scan_pos, start + 2))
+            if end is None:
+                return None
+
+            block = block_class(self.position + start, MappedStream(bytes(buffer[start:end]), self.position + start))
+            if block.broken:
+                return self._fail(block.broken_reason)
+
+            if isinstance(block, GraphicControlExtension):
+                self._gce = block
+            events.append((BLOCK_EVENT, block))
+        elif block_type == GIF_IMAGE_SEPARATOR:
+            # Image Descriptor (10 bytes)
+            if len(buffer) - start < 10:
+                return None
+
+            fields = buffer[start + 9]
+            data_start = start + 10
+            if fields & 0b10000000:
+                # Local Color Table
+                data_start += 3 * (2 ** ((fields & 0b00000111) + 1))
+
+            # LZW Minimum Code Size
+            if len(buffer) - data_start < 1:
+                return None
+
+            end = self._skip_sub_blocks(max(self._scan_pos, data_start + 1))
+            if end is None:
+                return None
+
+            image = ImageDescriptorBlock(
+                self.position + start,
+                MappedStream(bytes(buffer[start:end]), self.position + start),
+                palettes=self.palettes,
+            )
+            if image.broken:
+                return self._fail(image.broken_reason)
+
+            image.gce = self._gce
+            self._gce = None
+            self.frame_count += 1
+            events.append((FRAME_EVENT, image))
+        else:
+            return self._fail(f'Unknown block type ({block_type}) at {self.position + start}!')
+
+        self._scan_pos = end
+        return end
@@ -0,0 +1,32 @@
+import numpy as np
+
+
+def palette_lut(palette: bytes, transparent_color=None, alpha=True):
+    """Build a 256-entry color lookup table from color table data.
+
+    Args:
+        palette: The color table data (3 bytes per color).
+        transparent_color: The transparent color index from the Graphic Control Extension, `None` if the image has no transparency.
+        alpha: Whether the table has an alpha channel. The transparent color gets alpha 0, every other color alpha 255.
+
+    Returns:
+        A `(256, 4)` (or `(256, 3)` without alpha) `uint8` array. Indices out of the color table are black.
+    """
+    lut = np.zeros((256, 4 if alpha else 3), dtype=np.uint8)
+
+    colors = np.frombuffer(palette, dtype=np.uint8)
+    num_colors = min(len(colors) // 3, 256)
+    lut[:num_colors, :3] = colors[:num_colors * 3].reshape(num_colors, 3)
+
+    if alpha:
+        lut[:, 3] = 255
+        if transparent_color is not None:
+            lut[transparent_color, 3] = 0
+
+    return lut
+
+
+def render(index_stream: bytes, width: int, height: int, lut: np.ndarray):
+    """Turn an index stream into an `(height, width, channels)` `uint8` image with a single lookup table gather."""
+    indices = np.frombuffer(index_stream, dtype=np.uint8, count=width * height).reshape(height, width)
+    return lut[indices]
@@ -0,0 +1,259 @@
+import heapq
+import asyncio
+import itertools
+import concurrent.futures
+
+from decoder import GIF
+from probe import gif_loop_count
+from player import FORWARD, LOOPS_FROM_FILE, MonotonicClock, PlaybackFrame, frame_delay, frame_order
+
+DEFAULT_WORKERS = 4
+# deadlines closer than this to the earliest one are served in the same tick (seconds)
+DEFAULT_SLACK = 0.005
+
+
+def composite_frame(gif: GIF, i: int):
+    """Composite frame `i` in a worker. Returns a private copy of the canvas, `None` if the image is broken."""
+    canvas = gif.seek(i)
+    return canvas.copy() if canvas is not None else None
+
+
+class Animation:
+    """One `GIF` played by a `Scheduler`. Create it with `Scheduler.add`.
+
+    Attributes:
+        gif: The `GIF` being played.
+        on_frame: The callback `on_frame(animation, frame)` which shows a `PlaybackFrame`. It runs on the event loop.
+        visible: Whether the animation is played. Hidden animations do not decode anything and hold no decoded data.
+        finished: Whether the last frame of the playback order has been shown.
+        frame: The `PlaybackFrame` shown last, `None` while hidden.
+    """
+
+    __slots__ = (
+        'gif', 'on_frame', 'visible', 'finished', 'frame',
+        '_order', '_index', '_ready', '_job', '_deadline', '_waiting', '_generation',
+    )
+
+    def __init__(self, gif: GIF, on_frame, mode=FORWARD, loops=LOOPS_FROM_FILE):
+        self.gif = gif
+        self.on_frame = on_frame
+        self.visible = False
+        self.finished = False
+        self.frame = None
+
+        loops = gif_loop_count(gif) if loops == LOOPS_FROM_FILE else loops
+        self._order = frame_order(len(gif.images), mode, loops)
+        # the index of the next frame to show, its decoded frame and the decode job
+        self._index = next(self._order, None)
+        self._ready = None
+        self._job = None
+        self._deadline = 0.0
+        # whether the deadline has passed before the frame was decoded
+        self._waiting = False
+        # bumped by `hide` and `show` so that their older deadlines and decode results are ignored
+        self._generation = 0
+
+
+class Scheduler:
+    """Play many `GIF` objects on one asyncio event loop.
+
+    All the visible animations share one priority queue of next-frame deadlines. The loop sleeps until the earliest deadline and then serves every animation due within `slack` in the same tick, so animations with close deadlines cause one wakeup instead of one each. Frames are composited by a bounded thread pool shared by all animations, one frame ahead per animation, and a `GIF` is never used by two workers at once.
+
+    Hidden animations are taken out of the queue and release their decoded data (`GIF.release`), so the CPU and the memory used grow with the visible animations only. Showing an animation again decodes its next frame from the nearest keyframe or snapshot.
+
+    All methods except `run` must be called from the event loop thread.
+
+    Args:
+        workers: The number of decode threads.
+        slack: The tolerance in seconds used to merge deadlines into one tick.
+        clock: An object with a `now()` method returning seconds on a monotonic clock.
+        executor: The `concurrent.futures.Executor` which composites the frames instead of a pool of `workers` threads. It is shut down by `stop`.
+
+    Attributes:
+        animations: All the animations, visible or not.
+        ticks: The number of wakeups which showed frames.
+        frames_shown: The number of frames shown.
+        late: The number of frames which were not decoded by their deadline.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, slack=DEFAULT_SLACK, clock=None, executor=None):
+        if executor is None:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gif-decode')
+        self.executor = executor
+        self.slack = slack
+        self.clock = clock if clock is not None else MonotonicClock()
+        self.animations = []
+        self.ticks = 0
+        self.frames_shown = 0
+        self.late = 0
+
+        # (deadline, sequence number, generation, animation)
+        self._heap = []
+        self._sequence = itertools.count()
+        self._wakeup = None
+        self._loop = None
+        self._running = False
+
+    def add(self, gif: GIF, on_frame, visible=True, mode=FORWARD, loops=LOOPS_FROM_FILE):
+        """Add a `GIF` to play. Returns its `Animation`."""
+        animation = Animation(gif, on_frame, mode, loops)
+        self.animations.append(animation)
+        if visible:
+            self.show(animation)
+        return animation
+
+    def remove(self, animation: Animation):
+        self.hide(animation)
+        self.animations.remove(animation)
+
+    def show(self, animation: Animation):
+        """Resume an animation: its next frame is decoded and shown as soon as it is ready."""
+        if animation.visible:
+            return
+
+        animation.visible = True
+        animation._generation += 1
+        animation._deadline = self.clock.now()
+        animation._waiting = True
+        self._decode(animation)
+
+    def hide(self, animation: Animation):
+        """Pause an animation and release its decoded data."""
+        if not animation.visible:
+            return
+
+        animation.visible = False
+        animation._generation += 1
+        animation._ready = None
+        animation._waiting = False
+        animation.frame = None
+
+        # a running worker cannot be interrupted, the GIF is released when its job is done
+        if animation._job is None:
+            animation.gif.release()
+
+    def _push(self, animation: Animation):
+        heapq.heappush(self._heap, (animation._deadline, next(self._sequence), animation._generation, animation))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _decode(self, animation: Animation):
+        """Composite the next frame of an animation on the worker pool, unless a job is already running for it."""
+        if animation._index is None:
+            animation.finished = True
+            return
+        if animation._job is not None or self._loop is None:
+            # decoding starts with `start`
+            return
+
+        generation = animation._generation
+        job = self._loop.run_in_executor(self.executor, composite_frame, animation.gif, animation._index)
+        job.add_done_callback(lambda job: self._decoded(animation, generation, job))
+        animation._job = job
+
+    def _decoded(self, animation: Animation, generation: int, job):
+        animation._job = None
+
+        if job.cancelled():
+            # stopped
+            return
+        if generation != animation._generation:
+            # the animation has been hidden (and maybe shown again) in the meantime
+            if animation.visible:
+                self._decode(animation)
+            else:
+                animation.gif.release()
+            return
+
+        canvas = job.result()
+        if canvas is None:
+            # broken images are not shown
+            animation._index = next(animation._order, None)
+            self._decode(animation)
+            return
+
+        animation._ready = PlaybackFrame(animation._index, canvas, frame_delay(animation.gif, animation._index))
+        if animation._waiting:
+            # the deadline has passed already, show the frame in the next tick
+            animation._waiting = False
+            animation._deadline = max(animation._deadline, self.clock.now())
+            self._push(animation)
+
+    def _advance(self, animation: Animation, now: float):
+        """Show the decoded frame of an animation which is due and start decoding its next one."""
+        frame = animation._ready
+        if frame is None:
+            # pushed again by `_decoded`
+            self.late += 1
+            animation._waiting = True
+            return
+
+        animation._ready = None
+        animation.frame = frame
+        self.frames_shown += 1
+        animation.on_frame(animation, frame)
+
+        # the next deadline follows the schedule, unless the animation is more than a frame behind
+        animation._deadline += frame.delay
+        if animation._deadline <= now:
+            animation._deadline = now + frame.delay
+
+        animation._index = next(animation._order, None)
+        if animation._index is None:
+            animation.finished = True
+            return
+
+        self._decode(animation)
+        self._push(animation)
+
+    def tick(self):
+        """Show every frame which is due within `slack`. Returns the number of animations served."""
+        now = self.clock.now()
+        served = 0
+        while len(self._heap) > 0 and self._heap[0][0] <= now + self.slack:
+            _, _, generation, animation = heapq.heappop(self._heap)
+            if generation != animation._generation or not animation.visible:
+                continue
+            self._advance(animation, now)
+            served += 1
+
+        if served > 0:
+            self.ticks += 1
+        return served
+
+    def start(self):
+        """Start decoding the visible animations on the running event loop. `run` calls it; call it directly to drive the scheduler with `tick` from another loop."""
+        self._loop = asyncio.get_running_loop()
+
+        for animation in self.animations:
+            if animation.visible and animation._ready is None:
+                self._decode(animation)
+
+    async def run(self):
+        """Play the animations until `stop` is called."""
+        self._wakeup = asyncio.Event()
+        self._running = True
+        self.start()
+
+        while self._running:
+            self.tick()
+
+            timeout = None
+            if len(self._heap) > 0:
+                timeout = max(0.0, self._heap[0][0] - self.clock.now())
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        self._wakeup = None
+        self._loop = None
+
+    def stop(self):
+        """Stop `run` and the decode workers."""
+        self._running = False
+        if self._wakeup is not None:
+            self._wakeup.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
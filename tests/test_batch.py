@@ -0,0 +1,38 @@
+import io
+import json
+
+import batch
+import writer
+
+
+def write_files(directory):
+    palette = [(0, 0, 0), (255, 255, 255)]
+    for n in range(4):
+        frames = [writer.Frame(bytes([i % 2] * 16), 4, 4, delay_time=i) for i in range(n + 1)]
+        (directory / f'{n}.gif').write_bytes(writer.encode_gif(4, 4, frames, global_palette=palette))
+
+    data = writer.encode_gif(4, 4, [writer.Frame(bytes(16), 4, 4)], global_palette=palette)
+    # the image data is cut in the middle
+    (directory / 'truncated.gif').write_bytes(data[:len(data) - 6])
+    (directory / 'notes.txt').write_text('not a GIF')
+
+
+def results(patterns, jobs: int):
+    out = io.StringIO()
+    failures = batch.run(patterns, jobs, out)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    return failures, {line['path']: (line['status'], line['frames'], line['broken_reason']) for line in lines}
+
+
+def test_parallel_run_matches_serial_run(tmp_path):
+    write_files(tmp_path)
+    patterns = [str(tmp_path), str(tmp_path / 'missing.gif')]
+
+    failures, serial = results(patterns, 1)
+    assert failures == 2
+    assert sorted(serial) == sorted([str(tmp_path / f'{n}.gif') for n in range(4)] + [str(tmp_path / 'truncated.gif'), str(tmp_path / 'missing.gif')])
+    assert serial[str(tmp_path / '3.gif')] == ('ok', 4, None)
+    assert serial[str(tmp_path / 'truncated.gif')][0] == 'broken'
+    assert serial[str(tmp_path / 'missing.gif')][0] == 'error'
+
+    assert results(patterns, 3) == (failures, serial)
@@ -0,0 +1,73 @@
+import glob
+import os
+
+import numpy as np
+
+import writer
+from blockindex import IndexCache, IndexedImages, RECORD
+from decoder import GIF
+
+
+def write_gif(path):
+    frames = [
+        writer.Frame(bytes([i % 3] * 16), 4, 4, x=i % 2, y=0, delay_time=0x9000, disposal_method=i % 3, transparent_color=2 if i % 2 else None)
+        for i in range(20)
+    ]
+    frames[5].palette = [(10, 20, 30), (40, 50, 60), (70, 80, 90)]
+    path.write_bytes(writer.encode_gif(8, 4, frames, global_palette=[(0, 0, 0), (255, 255, 255), (255, 0, 0)], loop_count=0))
+    return str(path)
+
+
+def open_gif(path, cache):
+    with open(path, mode='rb') as stream:
+        gif = GIF(stream, lazy=True, index=cache)
+        return gif, [canvas.copy() for canvas in gif.composite()]
+
+
+def test_reopen_from_index(tmp_path):
+    path = write_gif(tmp_path / 'a.gif')
+    cache = IndexCache(str(tmp_path / 'index'))
+
+    parsed, expected = open_gif(path, cache)
+    restored, canvases = open_gif(path, cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert isinstance(restored.images, IndexedImages)
+
+    assert restored.keyframes == parsed.keyframes
+    assert restored.images[3].gce.delay_time == 0x9000
+    assert restored.images[5].local_palette is not None
+    assert len(canvases) == len(expected)
+    assert all(np.array_equal(a, b) for a, b in zip(canvases, expected))
+
+
+def test_images_are_built_on_access(tmp_path):
+    path = write_gif(tmp_path / 'a.gif')
+    cache = IndexCache(str(tmp_path / 'index'))
+    open_gif(path, cache)
+
+    with open(path, mode='rb') as stream:
+        gif = GIF(stream, lazy=True, index=cache)
+        assert gif.images.built() == []
+        gif.seek(gif.keyframes[-1])
+        assert 0 < len(gif.images.built()) < len(gif.images)
+        gif.release()
+
+
+def test_corrupt_index_falls_back_to_parsing(tmp_path):
+    path = write_gif(tmp_path / 'a.gif')
+    cache = IndexCache(str(tmp_path / 'index'))
+    _, expected = open_gif(path, cache)
+    index_path, = glob.glob(os.path.join(cache.directory, '*.gifindex'))
+    with open(index_path, mode='rb') as index:
+        data = index.read()
+
+    unknown_type = bytearray(data)
+    unknown_type[-RECORD.itemsize] = 99
+    for corrupt in (data[:-3], data[:10], bytes(unknown_type)):
+        with open(index_path, mode='wb') as index:
+            index.write(corrupt)
+
+        gif, canvases = open_gif(path, cache)
+        assert cache.hits == 0
+        assert not gif.broken
+        assert all(np.array_equal(a, b) for a, b in zip(canvases, expected))
@@ -0,0 +1,58 @@
+import struct
+
+import writer
+from decoder import GIF
+from mappedstream import MappedStream
+from pushparser import PushParser
+
+
+def small_gif():
+    frames = [writer.Frame(bytes([0, 1, 1, 0]), 2, 2)]
+    return bytearray(writer.encode_gif(2, 2, frames, global_palette=[(0, 0, 0), (255, 255, 255)]))
+
+
+def test_huge_screen_is_broken():
+    data = small_gif()
+    data[6:10] = struct.pack('<HH', 0x8000, 0x8000)
+
+    gif = GIF(MappedStream(bytes(data)), lazy=True)
+    assert gif.broken
+    assert 'Logical Screen' in gif.broken_reason
+
+    parser = PushParser()
+    parser.feed(bytes(data))
+    assert parser.broken
+
+
+def test_sizes_are_unsigned():
+    data = small_gif()
+    data[6:10] = struct.pack('<HH', 2, 0x8000)
+
+    gif = GIF(MappedStream(bytes(data)), lazy=True)
+    assert not gif.broken
+    assert gif.height == 0x8000
+    assert gif.seek(0).shape == (0x8000, 2, 4)
+
+
+def test_stream_identities_are_never_reused():
+    identities = set()
+    for _ in range(100):
+        # the streams are garbage collected at once, their ids are likely to be reused
+        identities.add(GIF(MappedStream(bytes(small_gif()))).identity)
+    assert len(identities) == 100
+
+
+def test_iteration_keeps_lazy_frames():
+    frames = [writer.Frame(bytes([i % 2] * 4), 2, 2) for i in range(3)]
+    data = writer.encode_gif(2, 2, frames, global_palette=[(0, 0, 0), (255, 255, 255)])
+
+    gif = GIF(MappedStream(data), lazy=True)
+    images = list(gif)
+    assert [bytes(image.index_stream) for image in images] == [frame.index_stream for frame in frames]
+    gif.release()
+    assert not any(image.decoded for image in images)
+
+    gif = GIF(MappedStream(data), lazy=True)
+    streamed = [bytes(image.index_stream) for image in gif.stream_frames()]
+    assert streamed == [frame.index_stream for frame in frames]
+    assert not any(image.decoded for image in gif.images)
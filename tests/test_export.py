@@ -0,0 +1,45 @@
+import random
+
+import numpy as np
+
+import writer
+from decoder import GIF
+from export import export_frames, load_frames
+from mappedstream import MappedStream
+
+
+def make_gif():
+    rng = random.Random(0)
+    frames = []
+    for i in range(10):
+        width, height = rng.randint(1, 9), rng.randint(1, 7)
+        frames.append(writer.Frame(
+            bytes(rng.randrange(3) for _ in range(width * height)),
+            width,
+            height,
+            x=rng.randint(0, 9 - width),
+            y=rng.randint(0, 7 - height),
+            delay_time=5 * i,
+            disposal_method=i % 4,
+            transparent_color=0 if i % 2 else None,
+        ))
+    data = writer.encode_gif(9, 7, frames, global_palette=[(0, 0, 0), (255, 0, 0), (0, 0, 255)], loop_count=2)
+    return GIF(MappedStream(data), lazy=True)
+
+
+def test_exported_frames_match_compositing(tmp_path):
+    expected = [canvas.copy() for canvas in make_gif().composite()]
+
+    for alpha, channels in ((True, 4), (False, 3)):
+        path = str(tmp_path / f'frames-{channels}.npy')
+        export_frames(make_gif(), path, alpha)
+
+        frames, metadata = load_frames(path)
+        assert isinstance(frames, np.memmap)
+        assert frames.shape == (len(expected), 7, 9, channels)
+        assert all(np.array_equal(frame, canvas[..., :channels]) for frame, canvas in zip(frames, expected))
+
+        assert metadata['shape'] == [len(expected), 7, 9, channels]
+        assert metadata['loop_count'] == 2
+        assert [frame['delay'] for frame in metadata['frames']] == [5 * i for i in range(10)]
+        assert not any(frame['broken'] for frame in metadata['frames'])
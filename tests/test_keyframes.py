@@ -0,0 +1,59 @@
+import random
+
+import numpy as np
+
+import writer
+from constants import *
+from decoder import GIF
+from keyframes import SnapshotStore
+from mappedstream import MappedStream
+
+WIDTH = 16
+HEIGHT = 12
+
+
+def make_data(count=60):
+    rng = random.Random(0)
+    frames = []
+    for i in range(count):
+        if i % 15 == 7:
+            # an opaque frame over the whole screen, a keyframe
+            width, height, x, y = WIDTH, HEIGHT, 0, 0
+            transparent_color = None
+        else:
+            width, height = rng.randint(1, WIDTH), rng.randint(1, HEIGHT)
+            x, y = rng.randint(0, WIDTH - width), rng.randint(0, HEIGHT - height)
+            transparent_color = 0
+
+        frames.append(writer.Frame(
+            bytes(rng.randrange(4) for _ in range(width * height)),
+            width,
+            height,
+            x=x,
+            y=y,
+            disposal_method=rng.choice((DISPOSAL_DO_NOT_DISPOSE, DISPOSAL_RESTORE_TO_BACKGROUND, DISPOSAL_RESTORE_TO_PREVIOUS)),
+            transparent_color=transparent_color,
+        ))
+    return writer.encode_gif(WIDTH, HEIGHT, frames, global_palette=[(0, 0, 0), (255, 0, 0), (0, 255, 0), (0, 0, 255)])
+
+
+def test_seek_matches_sequential_compositing():
+    data = make_data()
+    expected = [canvas.copy() for canvas in GIF(MappedStream(data), lazy=True).composite()]
+
+    # room for a few canvases only, the interval has to grow
+    snapshots = SnapshotStore(budget=4 * WIDTH * HEIGHT * 4 * 2, interval=2)
+    gif = GIF(MappedStream(data), lazy=True, snapshots=snapshots)
+    assert len(gif.keyframes) > 1
+
+    rng = random.Random(1)
+    order = [rng.randrange(len(expected)) for _ in range(200)]
+    for n in order:
+        assert np.array_equal(gif.seek(n), expected[n]), n
+
+    reversed_frames = [canvas.copy() for canvas in gif.reverse()]
+    assert len(reversed_frames) == len(expected)
+    assert all(np.array_equal(canvas, frame) for canvas, frame in zip(reversed_frames, expected[::-1]))
+
+    assert 0 < len(snapshots) and snapshots.size <= snapshots.budget
+    assert snapshots.interval > 2
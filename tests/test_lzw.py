@@ -0,0 +1,70 @@
+import random
+
+import lzw
+import writer
+from decoder import GIF
+from mappedstream import MappedStream
+from pushparser import PushParser, FRAME_EVENT
+
+
+def size_one_gif(width: int, height: int, image_data: bytes):
+    """A GIF with a 2-color Global Color Table and one image whose LZW Minimum Code Size is 1."""
+    table, size = writer.color_table([(0, 0, 0), (255, 255, 255)])
+    out = bytearray(b'GIF89a')
+    out += bytes([width, 0, height, 0, 0b10000000 | size, 0, 0]) + table
+    out += bytes([0x2c, 0, 0, 0, 0, width, 0, height, 0, 0, 1])
+    out += writer.sub_blocks(image_data)
+    out += b';'
+    return bytes(out)
+
+
+def random_indices(count: int, colors: int, seed=0):
+    rng = random.Random(seed)
+    return bytes(rng.randrange(colors) for _ in range(count))
+
+
+def test_round_trip_every_code_size():
+    for lzw_min_code_size in range(1, 9):
+        index_stream = random_indices(3000, 1 << lzw_min_code_size, lzw_min_code_size)
+        data = lzw.encode(index_stream, lzw_min_code_size)
+        assert lzw.decode(data, lzw_min_code_size, len(index_stream)) == (bytearray(index_stream), None)
+
+
+def test_round_trip_with_clear_codes():
+    # clear codes before and after the codes widen, in the middle and at the end of a batch
+    for clear_interval in (1, 5, 63, 64, 65, 300, 1000):
+        for lzw_min_code_size in (2, 8):
+            index_stream = random_indices(5000, 1 << lzw_min_code_size, clear_interval)
+            data = lzw.encode(index_stream, lzw_min_code_size, clear_interval)
+            assert lzw.decode(data, lzw_min_code_size, len(index_stream)) == (bytearray(index_stream), None)
+
+
+def test_truncated_last_code_is_broken():
+    # a clear code and byte-wide color indices without the last one, so the data may end on any batch boundary (the codes widen after 126 of them)
+    for pixel_count in range(1, 127):
+        data = bytes([128] + [i % 128 for i in range(pixel_count - 1)])
+        index_stream, broken_reason = lzw.decode(data, 7, pixel_count)
+        assert len(index_stream) == pixel_count - 1
+        assert broken_reason.startswith('Not enough image data!')
+
+
+def test_size_one_stream_decodes():
+    index_stream = random_indices(40 * 30, 2)
+    data = size_one_gif(40, 30, lzw.encode(index_stream, 1))
+
+    gif = GIF(MappedStream(data))
+    assert not gif.broken
+    assert gif.images[0].index_stream == index_stream
+
+    frames = [block for event, block in PushParser().feed(data) if event == FRAME_EVENT]
+    assert frames[0].index_stream == index_stream
+
+
+def test_size_one_garbage_terminates():
+    # used to loop forever: the first batch of codes was empty
+    data = size_one_gif(16, 16, bytes(range(7, 250, 3)))
+
+    gif = GIF(MappedStream(data))
+    assert len(gif.images) <= 1
+
+    PushParser().feed(data)
@@ -0,0 +1,63 @@
+import random
+
+import numpy as np
+
+import writer
+from constants import *
+from decoder import GIF
+from mappedstream import MappedStream
+from optimizer import Optimizer
+
+PALETTE = [(0, 0, 0), (255, 0, 0), (0, 255, 0), (0, 0, 255)]
+
+
+def shown(gif):
+    """The `(canvas, delay)` sequence displayed by a `GIF`, consecutive identical canvases merged."""
+    delays = [image.gce.delay_time if image.gce is not None else 0 for image in gif.images]
+    sequence = []
+    for canvas, delay_time in zip(gif.composite(), delays):
+        if len(sequence) > 0 and np.array_equal(sequence[-1][0], canvas):
+            sequence[-1][1] += delay_time
+        else:
+            sequence.append([canvas.copy(), delay_time])
+    return sequence
+
+
+def assert_same_animation(width, height, frames):
+    gif = GIF(MappedStream(writer.encode_gif(width, height, frames, global_palette=PALETTE)))
+    optimizer = Optimizer(gif)
+    assert optimizer.run()
+    optimized = GIF(MappedStream(writer.encode_gif(width, height, optimizer.frames, global_palette=PALETTE)))
+
+    expected = shown(gif)
+    result = shown(optimized)
+    assert [delay for _, delay in result] == [delay for _, delay in expected]
+    assert all(np.array_equal(a, b) for (a, _), (b, _) in zip(result, expected))
+
+
+def test_cleared_canvas_is_shown():
+    frames = [
+        writer.Frame(bytes([1] * 21), 7, 3, delay_time=20, disposal_method=DISPOSAL_RESTORE_TO_BACKGROUND),
+        writer.Frame(bytes([0] * 56), 7, 8, delay_time=15, transparent_color=0),
+    ]
+    assert_same_animation(7, 8, frames)
+
+
+def test_random_animations():
+    rng = random.Random(0)
+    for _ in range(100):
+        width, height = rng.randint(1, 8), rng.randint(1, 8)
+        frames = []
+        for _ in range(rng.randint(1, 5)):
+            frame_width, frame_height = rng.randint(1, width), rng.randint(1, height)
+            frames.append(writer.Frame(
+                bytes(rng.choice((0, 0, 1, 2, 3)) for _ in range(frame_width * frame_height)),
+                frame_width,
+                frame_height,
+                x=rng.randint(0, width - frame_width),
+                y=rng.randint(0, height - frame_height),
+                delay_time=rng.randint(0, 30),
+                disposal_method=rng.choice((DISPOSAL_UNSPECIFIED, DISPOSAL_DO_NOT_DISPOSE, DISPOSAL_RESTORE_TO_BACKGROUND, DISPOSAL_RESTORE_TO_PREVIOUS)),
+                transparent_color=rng.choice((None, 0)),
+            ))
+        assert_same_animation(width, height, frames)
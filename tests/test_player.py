@@ -0,0 +1,132 @@
+import pytest
+
+import writer
+from decoder import GIF
+from mappedstream import MappedStream
+from player import Player, REVERSE
+
+# the delays of the frames in hundredths of a second
+DELAYS = (10, 20, 30, 40)
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def now(self):
+        return self.time
+
+
+def make_gif():
+    frames = [writer.Frame(bytes([i, 0, 0, 0]), 2, 2, delay_time=delay) for i, delay in enumerate(DELAYS)]
+    data = writer.encode_gif(2, 2, frames, global_palette=[(i, i, i) for i in range(4)])
+    return GIF(MappedStream(data), lazy=True)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_player(clock, **kwargs):
+    player = Player(make_gif(), clock=clock, threaded=False, **kwargs)
+    player.play()
+    return player
+
+
+def test_frames_follow_their_own_deadlines(clock):
+    player = make_player(clock)
+    shown = []
+    # check every 10 ms until the end, just after the step so that rounding does not matter
+    for step in range(120):
+        clock.time = step / 100 + 1e-6
+        frame = player.update()
+        if frame is not None:
+            shown.append((frame.index, step))
+
+    assert shown == [(0, 0), (1, 10), (2, 30), (3, 60)]
+    assert player.skipped == 0
+    assert player.finished
+
+
+def test_deadlines_do_not_drift_with_late_updates(clock):
+    player = make_player(clock)
+    assert player.update().index == 0
+
+    # a late update shows frame 1, frame 2 is still due at 0.3
+    clock.time = 0.15
+    assert player.update().index == 1
+    assert player.time_until_next() == pytest.approx(0.15)
+
+
+def test_frames_are_skipped_when_behind(clock):
+    player = make_player(clock)
+    assert player.update().index == 0
+
+    # frames 1 and 2 are due, only the last one is shown
+    clock.time = 0.35
+    frame = player.update()
+    assert frame.index == 2
+    assert player.skipped == 1
+    # frame 2 keeps its schedule: it is due again at 0.3 + 0.3
+    assert player.time_until_next() == pytest.approx(0.25)
+
+
+def test_seek_drops_the_old_generation(clock):
+    player = make_player(clock, loops=0)
+    assert player.update().index == 0
+    # the queue already holds the frames after 0
+    assert not player._queue.empty()
+
+    clock.time = 0.05
+    player.seek(3)
+    assert player.update().index == 3
+
+    # the playback continues from the new position
+    clock.time = 0.05 + 0.4
+    assert player.update().index == 0
+
+
+def test_seek_while_paused_shows_one_frame(clock):
+    player = make_player(clock)
+    assert player.update().index == 0
+    player.pause()
+
+    player.seek(2)
+    assert player.update().index == 2
+    clock.time = 5.0
+    assert player.update() is None
+
+    # the frame gets its whole delay after resuming
+    player.resume()
+    assert player.time_until_next() == pytest.approx(0.3)
+
+
+def test_pause_and_resume_keep_the_remaining_time(clock):
+    player = make_player(clock)
+    assert player.update().index == 0
+
+    clock.time = 0.04
+    player.pause()
+    clock.time = 10.0
+    assert player.update() is None
+    assert player.time_until_next() is None
+
+    player.resume()
+    assert player.time_until_next() == pytest.approx(0.06)
+    clock.time = 10.05
+    assert player.update() is None
+    clock.time = 10.06
+    assert player.update().index == 1
+
+
+def test_reverse_order(clock):
+    player = make_player(clock, mode=REVERSE)
+    indices = []
+    for step in range(120):
+        clock.time = step / 100 + 1e-6
+        frame = player.update()
+        if frame is not None:
+            indices.append(frame.index)
+
+    assert indices == [3, 2, 1, 0]
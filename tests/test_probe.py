@@ -0,0 +1,12 @@
+import writer
+from mappedstream import MappedStream
+from probe import probe_stream
+
+
+def test_long_delays_are_unsigned():
+    frames = [writer.Frame(bytes(4), 2, 2, delay_time=40000), writer.Frame(bytes(4), 2, 2, delay_time=10)]
+    data = writer.encode_gif(2, 2, frames, global_palette=[(0, 0, 0), (255, 255, 255)])
+
+    result = probe_stream(MappedStream(data))
+    assert result['frames'] == 2
+    assert result['duration'] == 400100
@@ -0,0 +1,70 @@
+import random
+
+import writer
+from decoder import GIF
+from mappedstream import MappedStream
+from pushparser import PushParser, HEADER_EVENT, BLOCK_EVENT, FRAME_EVENT, TRAILER_EVENT
+
+
+def make_data():
+    rng = random.Random(0)
+    frames = []
+    for i in range(12):
+        width, height = rng.randint(1, 20), rng.randint(1, 16)
+        frames.append(writer.Frame(
+            bytes(rng.randrange(4) for _ in range(width * height)),
+            width,
+            height,
+            x=rng.randint(0, 20 - width),
+            y=rng.randint(0, 16 - height),
+            palette=[(i, 0, 0), (0, i, 0), (0, 0, i), (i, i, i)] if i % 3 == 0 else None,
+            delay_time=i,
+            disposal_method=i % 4,
+            transparent_color=i % 2 if i % 5 else None,
+            interlaced=i % 4 == 1,
+        ))
+    return writer.encode_gif(20, 16, frames, global_palette=[(0, 0, 0), (255, 0, 0), (0, 255, 0), (0, 0, 255)], loop_count=3)
+
+
+def image_state(image):
+    gce = image.gce
+    return (
+        image.seek_index, image.x, image.y, image.width, image.height, image.interlace_flag,
+        bytes(image.index_stream),
+        bytes(image.local_palette.data) if image.local_palette is not None else None,
+        (gce.delay_time, gce.disposal_method, gce.transparent_color_flag, gce.transparent_color) if gce is not None else None,
+    )
+
+
+def feed_in_chunks(data: bytes, sizes):
+    parser = PushParser()
+    events = []
+    start = 0
+    while start < len(data):
+        size = next(sizes)
+        events += parser.feed(data[start:start + size])
+        start += size
+    return parser, events
+
+
+def test_chunked_feed_matches_gif():
+    data = make_data()
+    gif = GIF(MappedStream(data))
+    assert not gif.broken
+    expected = [image_state(image) for image in gif.images]
+
+    rng = random.Random(1)
+    for sizes in (iter(lambda: 1, None), iter(lambda: 7, None), iter(lambda: rng.randint(1, 300), None), iter(lambda: len(data), None)):
+        parser, events = feed_in_chunks(data, sizes)
+
+        assert not parser.broken
+        assert parser.finished
+        assert parser.position == len(data)
+        assert (parser.width, parser.height, parser.background) == (gif.width, gif.height, gif.background)
+        assert bytes(parser.global_palette.data) == bytes(gif.global_palette.data)
+
+        kinds = [kind for kind, _ in events]
+        assert kinds[0] == HEADER_EVENT
+        assert kinds[-1] == TRAILER_EVENT
+        assert kinds.count(BLOCK_EVENT) == len(gif.blocks) - len(gif.images)
+        assert [image_state(image) for kind, image in events if kind == FRAME_EVENT] == expected
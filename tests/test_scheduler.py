@@ -0,0 +1,105 @@
+import asyncio
+import concurrent.futures
+
+import writer
+from decoder import GIF
+from mappedstream import MappedStream
+from scheduler import Scheduler
+
+# the delays of the frames in hundredths of a second
+DELAYS = (10, 20, 30, 40)
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def now(self):
+        return self.time
+
+
+class InlineExecutor(concurrent.futures.Executor):
+    """Composite the frames at once in the event loop thread, so that the tests do not depend on thread timing."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = concurrent.futures.Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+def make_gif():
+    frames = [writer.Frame(bytes([i, 0, 0, 0]), 2, 2, delay_time=delay) for i, delay in enumerate(DELAYS)]
+    data = writer.encode_gif(2, 2, frames, global_palette=[(i, i, i) for i in range(4)])
+    return GIF(MappedStream(data), lazy=True)
+
+
+async def settle():
+    # let the event loop deliver the finished decode jobs
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def play(steps: int, actions=None):
+    """Drive a `Scheduler` every 10 ms of a fake clock. `actions` maps a step to a function `action(scheduler, animations)` run before its tick.
+
+    Returns:
+        The scheduler, its two animations and the `(frame index, step)` shown by each of them.
+    """
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock, executor=InlineExecutor())
+    shown = ([], [])
+    step = 0
+
+    def on_frame(n):
+        return lambda animation, frame: shown[n].append((frame.index, step))
+
+    animations = [scheduler.add(make_gif(), on_frame(n), loops=None) for n in range(2)]
+
+    async def main():
+        nonlocal step
+        scheduler.start()
+        await settle()
+        for step in range(steps):
+            # just after the step so that rounding does not matter
+            clock.time = step / 100 + 1e-6
+            if actions is not None and step in actions:
+                actions[step](scheduler, animations)
+            scheduler.tick()
+            await settle()
+
+    asyncio.run(main())
+    scheduler.stop()
+    return scheduler, animations, shown
+
+
+def test_frames_follow_their_deadlines():
+    scheduler, animations, shown = play(120)
+
+    assert shown[0] == [(0, 0), (1, 10), (2, 30), (3, 60)]
+    assert shown[1] == shown[0]
+    assert all(animation.finished for animation in animations)
+    assert scheduler.frames_shown == 8
+    assert scheduler.late == 0
+    # both animations are due at the same time, they share every tick
+    assert scheduler.ticks == 4
+
+
+def test_hidden_animations_pause():
+    hidden_frames = []
+
+    def hide(scheduler, animations):
+        scheduler.hide(animations[1])
+
+    def check(scheduler, animations):
+        hidden_frames.append(animations[1].frame)
+
+    def show(scheduler, animations):
+        scheduler.show(animations[1])
+
+    scheduler, animations, shown = play(120, {15: hide, 40: check, 50: show})
+
+    assert shown[0] == [(0, 0), (1, 10), (2, 30), (3, 60)]
+    # hidden from 0.15 to 0.5: frame 2 is shown in the first tick after it has been decoded again, the schedule restarts at 0.5
+    assert shown[1] == [(0, 0), (1, 10), (2, 51), (3, 80)]
+    assert hidden_frames == [None]
+    assert scheduler.late == 0
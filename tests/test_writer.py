@@ -0,0 +1,39 @@
+import pytest
+
+import writer
+from decoder import GIF
+from mappedstream import MappedStream
+
+PALETTE = [(0, 0, 0), (255, 255, 255)]
+
+
+def test_large_sizes_round_trip():
+    index_stream = bytes(i % 2 for i in range(40000))
+    frames = [writer.Frame(index_stream, 1, 40000, x=40000, y=0, delay_time=50000)]
+    data = writer.encode_gif(1, 40000, frames, global_palette=PALETTE)
+
+    gif = GIF(MappedStream(data))
+    assert not gif.broken
+    assert (gif.width, gif.height) == (1, 40000)
+    image = gif.images[0]
+    assert (image.x, image.width, image.height) == (40000, 1, 40000)
+    assert image.gce.delay_time == 50000
+    assert image.index_stream == index_stream
+
+
+@pytest.mark.parametrize('field, value', [
+    ('x', -1),
+    ('y', 0x10000),
+    ('delay_time', 0x10000),
+    ('disposal_method', 8),
+])
+def test_out_of_range_fields(field, value):
+    frame = writer.Frame(bytes(4), 2, 2)
+    setattr(frame, field, value)
+    with pytest.raises(ValueError):
+        writer.encode_gif(2, 2, [frame], global_palette=PALETTE)
+
+
+def test_out_of_range_screen():
+    with pytest.raises(ValueError):
+        writer.encode_gif(0x10000, 2, [writer.Frame(bytes(4), 2, 2)], global_palette=PALETTE)
@@ -6,6 +6,8 @@ from baseblock import BaseBlock
 
 
 class PlainTextExtensionBlock(BaseBlock):
+    __slots__ = ('x', 'y', 'width', 'height', 'cell_width', 'cell_height', 'foreground', 'background', 'text_data')
+
     def __init__(self, seek_index: int, stream: io.BufferedReader):
         super().__init__(seek_index)
         self.x = 0
@@ -19,6 +21,7 @@ class PlainTextExtensionBlock(BaseBlock):
         self.text_data = None
 
         self._process_data_stream(stream)
+        self._report_parsed()
 
     def _process_data_stream(self, stream: io.BufferedReader):
         stream.seek(self.seek_index)
@@ -63,7 +66,7 @@ class PlainTextExtensionBlock(BaseBlock):
             # broken data
             return
 
-        self.x = struct.unpack('<h', bs)[0]
+        self.x = struct.unpack('<H', bs)[0]
 
         # 6. Expect Text Grid Top Position (2 bytes)
         bs = self._read(stream, 2)
@@ -71,7 +74,7 @@ class PlainTextExtensionBlock(BaseBlock):
             # broken data
             return
 
-        self.y = struct.unpack('<h', bs)[0]
+        self.y = struct.unpack('<H', bs)[0]
 
         # 7. Expect Image Grid Width (2 bytes)
         bs = self._read(stream, 2)
@@ -79,7 +82,7 @@ class PlainTextExtensionBlock(BaseBlock):
             # broken data
             return
 
-        self.width = struct.unpack('<h', bs)[0]
+        self.width = struct.unpack('<H', bs)[0]
 
         # 8. Expect Image Grid Height (2 bytes)
         bs = self._read(stream, 2)
@@ -87,7 +90,7 @@ class PlainTextExtensionBlock(BaseBlock):
             # broken data
             return
 
-        self.height = struct.unpack('<h', bs)[0]
+        self.height = struct.unpack('<H', bs)[0]
 
         # 9. Expect Character Cell Width
         bs = self._read(stream)
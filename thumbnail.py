@@ -0,0 +1,267 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+import numpy as np
+
+from compositor import Compositor
+from decoder import GIF, stream_identity
+
+# the sizes (longest side in pixels) of the poster frames kept by `PosterCache`, largest first
+LEVELS = (256, 128, 64)
+
+NEAREST = 'nearest'
+BOX = 'box'
+FILTERS = (NEAREST, BOX)
+
+
+def thumbnail_size(width: int, height: int, max_size: int):
+    """The `(width, height)` of a thumbnail whose longest side is at most `max_size`, keeping the aspect ratio. Images are never enlarged."""
+    scale = min(1.0, max_size / max(width, height, 1))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def sample_positions(size: int, thumbnail_size: int):
+    """The source pixel at the center of every thumbnail pixel along one axis (increasing)."""
+    return (2 * np.arange(thumbnail_size) + 1) * size // (2 * thumbnail_size)
+
+
+def shrink(image: np.ndarray, width: int, height: int):
+    """Downscale an RGBA image with a box filter. Every output pixel is the alpha-weighted average of the source pixels it covers, so transparent pixels do not darken the edges."""
+    source_height, source_width = image.shape[:2]
+    if (source_width, source_height) == (width, height):
+        return image
+
+    rows = np.arange(height) * source_height // height
+    columns = np.arange(width) * source_width // width
+
+    alpha = image[..., 3:].astype(np.uint64)
+    weighted = np.concatenate([image[..., :3] * alpha, alpha], axis=2)
+    sums = np.add.reduceat(np.add.reduceat(weighted, rows, axis=0), columns, axis=1)
+    counts = np.diff(np.append(rows, source_height))[:, None] * np.diff(np.append(columns, source_width))[None, :]
+
+    result = np.zeros((height, width, 4), dtype=np.uint8)
+    total_alpha = sums[..., 3]
+    opaque = total_alpha > 0
+    result[..., :3][opaque] = (sums[..., :3][opaque] + total_alpha[opaque, None] // 2) // total_alpha[opaque, None]
+    result[..., 3] = (total_alpha + counts // 2) // counts
+    return result
+
+
+def resize(image: np.ndarray, width: int, height: int):
+    """Resize an image to exactly `width` x `height`, ignoring the aspect ratio. Shrinking on both axes uses `shrink`, anything else samples the nearest pixels."""
+    source_height, source_width = image.shape[:2]
+    if width <= source_width and height <= source_height:
+        return shrink(image, width, height)
+
+    return image[np.ix_(sample_positions(source_height, height), sample_positions(source_width, width))]
+
+
+def composite_thumbnails(gif: GIF, max_size=128, filter=NEAREST, samples=4):
+    """Iterate through the composited frames of a `GIF`, downscaled, without rendering any frame at full resolution.
+
+    Only the pixels sampled by the thumbnail are taken from the index streams and looked up in the color tables. Compositing works pixel by pixel, so compositing the sampled frames on a thumbnail-sized canvas gives exactly the sampled full-size canvas. The full-size index streams are still decoded (one byte per pixel); with a lazy `GIF` they are released after each frame.
+
+    Args:
+        gif: The `GIF` to downscale.
+        max_size: The longest side of the thumbnails.
+        filter: `NEAREST` samples one pixel per thumbnail pixel. `BOX` samples `samples * samples` pixels and averages them.
+        samples: The number of samples along each axis of a thumbnail pixel with `BOX`.
+
+    Yields:
+        The `(height, width, 4)` thumbnail after each frame. With `NEAREST` the same array is updated in place, copy it to keep a frame. Broken images are skipped.
+    """
+    if filter not in FILTERS:
+        raise ValueError(f'Unknown filter {filter}, expected one of {FILTERS}!')
+
+    width, height = thumbnail_size(gif.width, gif.height, max_size)
+    factor = 1
+    if filter == BOX:
+        # never sample more pixels than the source has
+        factor = max(1, min(samples, gif.width // width, gif.height // height))
+
+    xs = sample_positions(gif.width, width * factor)
+    ys = sample_positions(gif.height, height * factor)
+    compositor = Compositor(width * factor, height * factor)
+
+    for i, image in enumerate(gif.images):
+        decoded = image.decoded
+        gif.frame(i)
+        if image.broken:
+            continue
+
+        # the thumbnail pixels whose samples fall inside the image
+        left, right = np.searchsorted(xs, (image.x, image.x + image.width))
+        top, bottom = np.searchsorted(ys, (image.y, image.y + image.height))
+
+        indices = np.frombuffer(image.index_stream, dtype=np.uint8).reshape(image.height, image.width)
+        indices = indices[np.ix_(ys[top:bottom] - image.y, xs[left:right] - image.x)]
+
+        if gif.lazy and not decoded:
+            image.release()
+
+        gce = image.gce
+        transparent_color = gce.transparent_color if gce is not None and gce.transparent_color_flag else None
+        frame = gif.palette(i).lut(transparent_color)[indices]
+
+        if gce is None:
+            compositor.apply(frame, left, top, transparent=False)
+        else:
+            compositor.apply(frame, left, top, gce.disposal_method, gce.transparent_color_flag)
+
+        if factor == 1:
+            yield compositor.canvas
+        else:
+            yield shrink(compositor.canvas, width, height)
+
+
+def poster(gif: GIF, max_size=128, filter=BOX, frame=0):
+    """The thumbnail of the `frame`-th composited frame (the first one by default), `None` if there is no such frame."""
+    for i, thumbnail in enumerate(composite_thumbnails(gif, max_size, filter)):
+        if i == frame:
+            return thumbnail.copy()
+
+    return None
+
+
+class PosterCache:
+    """Keep a pyramid of poster frames on disk, so gallery pages neither decode nor downscale a GIF twice.
+
+    The first request for a file decodes its poster frame once at the largest level, derives the smaller levels from it and saves all of them as `.npy` files named after the file identity (device, inode, size and modification time), so a changed file gets new posters. Other sizes are shrunk from the closest larger level.
+
+    Args:
+        directory: The cache directory, created if needed.
+        levels: The sizes (longest side) of the stored posters.
+        filter: The filter of the largest level.
+
+    Attributes:
+        hits: The number of posters served from the disk.
+        misses: The number of files decoded to build their pyramid.
+    """
+
+    def __init__(self, directory: str, levels=LEVELS, filter=BOX):
+        self.directory = directory
+        self.levels = sorted(levels, reverse=True)
+        self.filter = filter
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, identity, level: int):
+        key = hashlib.sha1(repr(identity).encode()).hexdigest()
+        return os.path.join(self.directory, f'{key}-{level}.npy')
+
+    def _build(self, stream, identity):
+        """Decode the poster frame and save every level. Returns the levels in the order of `self.levels`."""
+        gif = GIF(stream, lazy=True)
+        if gif.broken:
+            return None
+
+        image = poster(gif, self.levels[0], self.filter)
+        if image is None:
+            return None
+
+        images = []
+        for level in self.levels:
+            image = shrink(image, *thumbnail_size(image.shape[1], image.shape[0], level))
+            images.append(image)
+
+            path = self._path(identity, level)
+            # write to a temporary file first so that concurrent readers never see a partial poster
+            temporary_path = f'{path}.{os.getpid()}.tmp'
+            with open(temporary_path, mode='wb') as output:
+                np.save(output, image)
+            os.replace(temporary_path, path)
+
+        return images
+
+    def get(self, path: str, max_size=128):
+        """The poster frame of a GIF file with its longest side at most `max_size`, `None` if the file is broken or has no frame."""
+        # the smallest level which is still large enough
+        candidates = [level for level in self.levels if level >= max_size]
+        level = candidates[-1] if len(candidates) > 0 else self.levels[0]
+
+        with open(path, mode='rb') as stream:
+            identity = stream_identity(stream)
+            level_path = self._path(identity, level)
+
+            if os.path.isfile(level_path):
+                self.hits += 1
+                image = np.load(level_path)
+            else:
+                self.misses += 1
+                images = self._build(stream, identity)
+                if images is None:
+                    return None
+                image = images[self.levels.index(level)]
+
+        return shrink(image, *thumbnail_size(image.shape[1], image.shape[0], max_size))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build the poster thumbnails of GIF files and print their sizes as JSON lines',
+    )
+
+    parser.add_argument(
+        'in_files',
+        type=str,
+        nargs='+',
+        help='the paths of GIF files',
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        default=128,
+        help='the longest side of the thumbnails in pixels',
+    )
+    parser.add_argument(
+        '--filter',
+        type=str,
+        choices=FILTERS,
+        default=BOX,
+        help='the downscaling filter',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        default=None,
+        help='keep the poster pyramids in this directory',
+    )
+
+    args = parser.parse_args()
+
+    cache = PosterCache(args.cache_dir, filter=args.filter) if args.cache_dir is not None else None
+
+    status = 0
+    for in_file in args.in_files:
+        if not os.path.isfile(in_file):
+            print(f'{in_file} is not a file!', file=sys.stderr)
+            status = 1
+            continue
+
+        start = time.perf_counter()
+        if cache is not None:
+            image = cache.get(in_file, args.size)
+        else:
+            with open(in_file, mode='rb') as stream:
+                image = poster(GIF(stream, lazy=True), args.size, args.filter)
+
+        result = {
+            'path': in_file,
+            'width': image.shape[1] if image is not None else 0,
+            'height': image.shape[0] if image is not None else 0,
+            'time': time.perf_counter() - start,
+        }
+        print(json.dumps(result))
+        if image is None:
+            status = 1
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
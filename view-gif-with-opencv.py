@@ -2,9 +2,12 @@ import os
 import sys
 import argparse
 
-import numpy as np
 import cv2
 
+from decoder import GIF
+from keyframes import SnapshotStore
+from player import Player, MODES, FORWARD
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -16,6 +19,13 @@ def main():
         type=str,
         help='the path of GIF file',
     )
+    parser.add_argument(
+        '--mode',
+        type=str,
+        choices=MODES,
+        default=FORWARD,
+        help='the playback order',
+    )
 
     args = parser.parse_args()
 
@@ -24,28 +34,40 @@ def main():
         print(f'{in_file} does not exist!')
         sys.exit()
 
-    cap = cv2.VideoCapture(in_file)
-    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    print(f'frame_count: {frame_count}')
-    print(f'fps: {fps}')
+    with open(in_file, mode='rb') as stream:
+        gif = GIF(stream, lazy=True, snapshots=SnapshotStore())
+
+    if gif.broken or len(gif) == 0:
+        print(f'{in_file} is broken: {gif.broken_reason}')
+        sys.exit(1)
 
-    default_wait = int(1000 / fps)
-    print(f'default_wait: {default_wait}')
+    print(f'frame_count: {len(gif)}')
+    print(f'keyframes: {len(gif.keyframes)}')
 
-    while True:
-        ret, frame = cap.read()
+    player = Player(gif, mode=args.mode)
+    player.play()
 
-        if ret:
-            cv2.imshow('frame', frame)
+    # q: quit, space: pause, a / d: previous / next frame
+    while not player.finished:
+        frame = player.update()
+        if frame is not None:
+            cv2.imshow('frame', cv2.cvtColor(frame.canvas, cv2.COLOR_RGBA2BGR))
 
-            k = cv2.waitKey(default_wait) & 0xff
-            if k == ord('q'):
-                break
-        else:
+        wait = player.time_until_next()
+        # waitKey also runs the window events, never block longer than the next deadline
+        k = cv2.waitKey(max(1, int(wait * 1000)) if wait is not None else 50) & 0xff
+        if k == ord('q'):
             break
+        elif k == ord(' '):
+            if player.paused:
+                player.resume()
+            else:
+                player.pause()
+        elif k in (ord('a'), ord('d')) and player.frame is not None:
+            step = -1 if k == ord('a') else 1
+            player.seek((player.frame.index + step) % len(gif))
 
-    cap.release()
+    player.stop()
     cv2.destroyAllWindows()
 
 
@@ -0,0 +1,239 @@
+import struct
+import concurrent.futures
+
+import lzw
+from constants import *
+from imageblock import interlace
+from palette import Palette
+
+# the application identifier + authentication code of the looping extension
+NETSCAPE_LOOP = b'NETSCAPE2.0'
+
+
+def palette_data(palette):
+    """The raw color table data of a `Palette`, of `bytes` or of a list of `[r, g, b]` lists (as returned by `load_global_palette`)."""
+    if isinstance(palette, Palette):
+        return palette.data
+    if len(palette) > 0 and not isinstance(palette[0], int):
+        return bytes(component for color in palette for component in color)
+    return bytes(palette)
+
+
+def color_table(palette):
+    """Pad a color table to the next power of two (at least 2 colors) as the format requires.
+
+    Returns:
+        A tuple of the color table data and its size field (the table holds `2 ** (size + 1)` colors).
+    """
+    data = palette_data(palette)
+    num_colors = len(data) // 3
+    if num_colors == 0 or num_colors > 256 or len(data) % 3 != 0:
+        raise ValueError(f'A color table holds 1 to 256 RGB colors, got {len(data)} bytes!')
+
+    size = max(1, (num_colors - 1).bit_length()) - 1
+    return data + bytes(3 * (2 ** (size + 1)) - len(data)), size
+
+
+def sub_blocks(data: bytes):
+    """Split data into sub-blocks of at most 255 bytes, followed by the block terminator."""
+    out = bytearray()
+    for i in range(0, len(data), 255):
+        chunk = data[i:i + 255]
+        out.append(len(chunk))
+        out += chunk
+    out.append(0)
+    return bytes(out)
+
+
+def encode_image_data(index_stream: bytes, lzw_min_code_size: int, width: int, height: int, interlaced: bool, clear_interval=None):
+    """Encode an index stream in display order into the image data sub-blocks, the inverse of `decode_image_data`.
+
+    It only depends on its arguments, so images can be encoded in parallel in worker processes.
+    """
+    if interlaced:
+        index_stream = interlace(index_stream, width, height)
+
+    return sub_blocks(lzw.encode(index_stream, lzw_min_code_size, clear_interval))
+
+
+class Frame:
+    """One image of an animation to be written.
+
+    Args:
+        index_stream: The color indices in display order, `width * height` of them (`bytes`, `bytearray`, `uint8` array or a list of `int`).
+        palette: The Local Color Table. `None` (or the Global Color Table itself) uses the Global Color Table.
+        delay_time: The delay after the frame in hundredths of a second.
+        disposal_method: One of the `DISPOSAL_*` constants.
+        transparent_color: The transparent color index, `None` if the frame is opaque.
+        interlaced: Store the rows in the interlaced order.
+        user_input: Set the User Input Flag of the Graphic Control Extension.
+    """
+
+    __slots__ = (
+        'index_stream', 'width', 'height', 'x', 'y', 'palette',
+        'delay_time', 'disposal_method', 'transparent_color', 'interlaced', 'user_input',
+    )
+
+    def __init__(
+        self,
+        index_stream,
+        width: int,
+        height: int,
+        x=0,
+        y=0,
+        palette=None,
+        delay_time=0,
+        disposal_method=DISPOSAL_UNSPECIFIED,
+        transparent_color=None,
+        interlaced=False,
+        user_input=False,
+    ):
+        self.index_stream = bytes(index_stream)
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+        self.palette = palette
+        self.delay_time = delay_time
+        self.disposal_method = disposal_method
+        self.transparent_color = transparent_color
+        self.interlaced = interlaced
+        self.user_input = user_input
+
+        if len(self.index_stream) != width * height:
+            raise ValueError(f'The frame has {width * height} pixels but {len(self.index_stream)} indices!')
+
+    @classmethod
+    def from_image(cls, image):
+        """Copy a decoded `ImageDescriptorBlock` with its Local Color Table and Graphic Control Extension."""
+        gce = image.gce
+        return cls(
+            image.index_stream,
+            image.width,
+            image.height,
+            image.x,
+            image.y,
+            palette=image.local_palette,
+            delay_time=gce.delay_time if gce is not None else 0,
+            disposal_method=gce.disposal_method if gce is not None else DISPOSAL_UNSPECIFIED,
+            transparent_color=gce.transparent_color if gce is not None and gce.transparent_color_flag else None,
+            interlaced=image.interlace_flag,
+            user_input=gce.user_input_flag if gce is not None else False,
+        )
+
+    def has_gce(self):
+        """Whether the frame needs a Graphic Control Extension."""
+        return self.delay_time != 0 or self.disposal_method != DISPOSAL_UNSPECIFIED or self.transparent_color is not None or self.user_input
+
+
+def encode_gif(width: int, height: int, frames: list, global_palette=None, loop_count=None, background=0, jobs=1, clear_interval=None):
+    """Encode frames into a GIF89a data stream.
+
+    The blocks are laid out as: header, Logical Screen Descriptor, Global Color Table, NETSCAPE2.0 looping extension, then an optional Graphic Control Extension and an Image Descriptor with its optional Local Color Table and image data for every frame, and the trailer.
+
+    Args:
+        width: The width of the Logical Screen.
+        height: The height of the Logical Screen.
+        frames: `Frame` objects in display order.
+        global_palette: The Global Color Table (see `palette_data`). Frames without their own palette use it.
+        loop_count: Write a looping extension with this loop count (0 loops forever). `None` writes no looping extension.
+        background: The Background Color Index.
+        jobs: The number of worker processes which encode the image data, `None` for the number of CPUs. Every image is encoded independently, the blocks are then written in order.
+        clear_interval: Emit a clear code after this many codes (see `lzw.encode`).
+
+    Returns:
+        The GIF data (`bytes`). Decoding it with `GIF` gives back the index streams of the frames exactly.
+    """
+    if not (0 < width <= 0xffff and 0 < height <= 0xffff) or width * height > MAX_SCREEN_PIXELS:
+        raise ValueError(f'The Logical Screen size ({width}x{height}) is out of range!')
+    if not 0 <= background <= 0xff:
+        raise ValueError(f'The Background Color Index ({background}) is out of range!')
+    if loop_count is not None and not 0 <= loop_count <= 0xffff:
+        raise ValueError(f'The loop count ({loop_count}) is out of range!')
+
+    global_table = None
+    if global_palette is not None:
+        global_table, global_size = color_table(global_palette)
+
+    # the color table and LZW Minimum Code Size of every frame
+    tables = []
+    for i, frame in enumerate(frames):
+        if frame.palette is not None:
+            table, size = color_table(frame.palette)
+            if table == global_table:
+                table = None
+        elif global_table is not None:
+            table, size = None, global_size
+        else:
+            raise ValueError(f'Frame {i} has no color table and there is no Global Color Table!')
+
+        if frame.width * frame.height > 0 and max(frame.index_stream) >= 2 ** (size + 1):
+            raise ValueError(f'Frame {i} uses color indices beyond its color table of {2 ** (size + 1)} colors!')
+        if frame.transparent_color is not None and not 0 <= frame.transparent_color <= 255:
+            raise ValueError(f'The transparent color ({frame.transparent_color}) of frame {i} is out of range!')
+        for name in ('x', 'y', 'width', 'height', 'delay_time'):
+            value = getattr(frame, name)
+            if not 0 <= value <= 0xffff:
+                raise ValueError(f'The {name} ({value}) of frame {i} is out of range!')
+        if not 0 <= frame.disposal_method <= 7:
+            raise ValueError(f'The disposal method ({frame.disposal_method}) of frame {i} is out of range!')
+
+        # the minimum code size is 2 even for 2 colors
+        tables.append((table, size, max(2, size + 1)))
+
+    tasks = [
+        (frame.index_stream, lzw_min_code_size, frame.width, frame.height, frame.interlaced, clear_interval)
+        for frame, (_, _, lzw_min_code_size) in zip(frames, tables)
+    ]
+    if jobs == 1 or len(tasks) <= 1:
+        image_data = [encode_image_data(*task) for task in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            image_data = list(executor.map(encode_image_data, *zip(*tasks)))
+
+    out = bytearray(gif89a_sig)
+
+    # Logical Screen Descriptor
+    fields = 0
+    if global_table is not None:
+        # Global Color Table Flag, Color Resolution and Size of Global Color Table
+        fields = 0b10000000 | (global_size << 4) | global_size
+    out += struct.pack('<HHBBB', width, height, fields, background, 0)
+    if global_table is not None:
+        out += global_table
+
+    if loop_count is not None:
+        out += bytes([GIF_EXTENSION_INTRODUCER, GIF_APP_EXT_LABEL, len(NETSCAPE_LOOP)]) + NETSCAPE_LOOP
+        # sub-block ID 1 holds the loop count
+        out += bytes([3, 1]) + struct.pack('<H', loop_count) + bytes([0])
+
+    for frame, (table, size, lzw_min_code_size), data in zip(frames, tables, image_data):
+        if frame.has_gce():
+            # Graphic Control Extension
+            fields = (frame.disposal_method << 2) | (int(frame.user_input) << 1) | int(frame.transparent_color is not None)
+            transparent_color = frame.transparent_color if frame.transparent_color is not None else 0
+            out += bytes([GIF_EXTENSION_INTRODUCER, GIF_GCE_EXT_LABEL, 4, fields])
+            out += struct.pack('<HB', frame.delay_time, transparent_color) + bytes([0])
+
+        # Image Descriptor
+        fields = 0
+        if table is not None:
+            fields |= 0b10000000 | size
+        if frame.interlaced:
+            fields |= 0b01000000
+        out += bytes([GIF_IMAGE_SEPARATOR]) + struct.pack('<HHHHB', frame.x, frame.y, frame.width, frame.height, fields)
+        if table is not None:
+            out += table
+
+        out.append(lzw_min_code_size)
+        out += data
+
+    out.append(GIF_TRAILER)
+    return bytes(out)
+
+
+def write_gif(path: str, width: int, height: int, frames: list, **kwargs):
+    """Encode frames into a GIF89a file. The keyword arguments are those of `encode_gif`."""
+    data = encode_gif(width, height, frames, **kwargs)
+    with open(path, mode='wb') as stream:
+        stream.write(data)